@@ -1,10 +1,66 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
+import time
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
 
 DATABASE_URL_ASYNC = os.environ.get("DATABASE_URL_ASYNC")
+DATABASE_URL_REPLICA = os.environ.get("DATABASE_URL_REPLICA")
+
+DB_ECHO = _env_bool("DB_ECHO", False)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 100))
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_max = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            self.overflow_max = max(self.overflow_max, self.overflow())
+
 
-async_engine = create_async_engine(DATABASE_URL_ASYNC, echo=True)
+def engine_options(url: str) -> dict:
+    """Build create_async_engine keyword arguments for the given database URL"""
+    options = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        return options
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    if "+asyncpg" in url:
+        options["connect_args"] = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+async_engine = create_async_engine(DATABASE_URL_ASYNC, **engine_options(DATABASE_URL_ASYNC))
 AsyncSessionLocal = sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
@@ -13,6 +69,33 @@ AsyncSessionLocal = sessionmaker(
     autoflush=False
 )
 
+# optional read-only replica; see database/routing.py for which requests use it
+replica_engine = (create_async_engine(DATABASE_URL_REPLICA, **engine_options(DATABASE_URL_REPLICA))
+                  if DATABASE_URL_REPLICA else None)
+ReplicaSessionLocal = sessionmaker(
+    bind=replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False
+) if replica_engine is not None else None
+
 async def async_get_database() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def pool_stats(engine=async_engine) -> dict:
+    """Return connection pool statistics of the engine"""
+    pool = engine.pool
+    stats = {"pool": pool.__class__.__name__, "status": pool.status()}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(),
+                     overflow=pool.overflow(), max_overflow=pool._max_overflow)
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(checkouts=pool.checkouts,
+                     overflow_max=pool.overflow_max,
+                     wait_seconds_total=round(pool.wait_seconds_total, 6),
+                     wait_seconds_max=round(pool.wait_seconds_max, 6),
+                     wait_seconds_avg=round(pool.wait_seconds_total / pool.checkouts, 6) if pool.checkouts else 0.0)
+    return stats
@@ -1,32 +1,70 @@
-from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean
+from sqlalchemy.orm import declarative_base, relationship, validates
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Boolean, Index
+
+from My_project.services.normalize import normalize_email, normalize_phone
 
 Base = declarative_base()
 
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _normalized(source: str, normalize):
+    """Column default deriving a lookup key from another column of the same row on Core inserts"""
+    def default(context):
+        return normalize(context.get_current_parameters().get(source))
+    return default
+
 class PhoneNumber(Base):
     """Class for phone number"""
     __tablename__ = "phone_numbers"
     id = Column(Integer, primary_key=True)
     phone_number = Column(String(15), nullable=True)
-    contact_id = Column(Integer, ForeignKey("contacts.id"))
+    phone_normalized = Column(String(15), nullable=True, index=True,
+                              default=_normalized("phone_number", normalize_phone))
+    contact_id = Column(Integer, ForeignKey("contacts.id"), index=True)
     contact = relationship("Contact", back_populates="phone_numbers")
 
+    @validates("phone_number")
+    def validate_phone_number(self, key, value):
+        self.phone_normalized = normalize_phone(value)
+        return value
+
 class Email(Base):
     """Class for email"""
     __tablename__ = "emails"
     id = Column(Integer, primary_key=True)
     email = Column(String(128), nullable=True)
-    contact_id = Column(Integer, ForeignKey("contacts.id"))
+    email_normalized = Column(String(128), nullable=True, index=True,
+                              default=_normalized("email", normalize_email))
+    contact_id = Column(Integer, ForeignKey("contacts.id"), index=True)
     contact = relationship("Contact", back_populates="emails")
 
+    @validates("email")
+    def validate_email(self, key, value):
+        self.email_normalized = normalize_email(value)
+        return value
+
 class Contact(Base):
     """Class for contact"""
     __tablename__ = "contacts"
+    __table_args__ = (
+        Index("ix_contacts_user_id_birthday_key", "user_id", "birthday_key"),
+        Index("ix_contacts_user_id_change_seq", "user_id", "change_seq", "id"),
+    )
     id = Column(Integer, primary_key=True)
     first_name = Column(String(64), nullable=True)
     last_name = Column(String(64), nullable=True)
     date_of_birthday = Column(Date, nullable=True)
+    birthday_key = Column(Integer, nullable=True)  # month * 100 + day of date_of_birthday
     additional_data = Column(String(256), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True, default=utcnow, onupdate=utcnow)
+    # the owner's contact_change_seq of the last change, including phone numbers and emails; drives the changes feed
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # tombstone of a deleted contact
     phone_numbers = relationship("PhoneNumber", back_populates="contact", cascade="all, delete-orphan")
     emails = relationship("Email", back_populates="contact", cascade="all, delete-orphan")
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -39,7 +77,8 @@ class User(Base):
     username = Column(String(32), nullable=True)
     email = Column(String(150), nullable=False, unique=True)
     password = Column(String(255), nullable=False)
-    avatar = Column(String(255), nullable=False)
+    avatar = Column(String(255), nullable=True)  # uploaded avatar; Gravatar is used when empty
     refresh_token = Column(String(255), nullable=True)
+    contact_change_seq = Column(Integer, nullable=False, default=0, server_default="0")  # last number handed to a contact change
     contacts = relationship("Contact", back_populates="user", cascade="all, delete-orphan")
     confirmed = Column(Boolean, default=False)
\ No newline at end of file
@@ -0,0 +1,119 @@
+import time
+from os import environ
+from typing import Optional
+
+from fastapi import Depends, Request
+from jose import JWTError
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from My_project.database.database import AsyncSessionLocal, ReplicaSessionLocal, async_get_database
+from My_project.services.auth import token_cache
+
+DB_REPLICA_STICKY_SECONDS = float(environ.get("DB_REPLICA_STICKY_SECONDS", 5))
+DB_REPLICA_STICKY_LOCAL_SIZE = int(environ.get("DB_REPLICA_STICKY_LOCAL_SIZE", 10000))
+
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+class ReplicaStickiness:
+    """Read-your-writes window per user.
+
+    After a user sends a write, their reads go to the primary for
+    sticky_seconds so they never see a replica that has not caught up yet.
+    Marks are kept in process memory and, once init is called, in Redis
+    under db:sticky:{subject} so every worker honours them.
+    """
+
+    def __init__(self, sticky_seconds: float, local_size: int):
+        self.sticky_seconds = sticky_seconds
+        self.local_size = local_size
+        self.redis = None
+        self._until = {}
+
+    async def init(self, redis_client) -> None:
+        """Attach the Redis client shared by all workers"""
+        self.redis = redis_client
+
+    @staticmethod
+    def _key(subject: str) -> str:
+        return f"db:sticky:{subject}"
+
+    async def mark(self, subject: str) -> None:
+        """Send reads of the subject to the primary for the next sticky_seconds"""
+        now = time.monotonic()
+        self._until[subject] = now + self.sticky_seconds
+        if len(self._until) > self.local_size:
+            self._until = {key: until for key, until in self._until.items() if until > now}
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._key(subject), 1, px=int(self.sticky_seconds * 1000))
+            except RedisError as e:
+                print(f"Replica routing ---- {e}")
+
+    async def is_sticky(self, subject: str) -> bool:
+        """Return True while the subject's recent write may not have reached the replica"""
+        until = self._until.get(subject)
+        if until is not None:
+            if until > time.monotonic():
+                return True
+            del self._until[subject]
+        if self.redis is None:
+            return False
+        try:
+            return bool(await self.redis.exists(self._key(subject)))
+        except RedisError as e:
+            print(f"Replica routing ---- {e}")
+            # without Redis the replica may be stale for this user, the primary is always safe
+            return True
+
+
+stickiness = ReplicaStickiness(DB_REPLICA_STICKY_SECONDS, DB_REPLICA_STICKY_LOCAL_SIZE)
+
+
+def token_subject(request: Request) -> Optional[str]:
+    """function read the subject of the bearer access token, without touching the database"""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = token_cache.decode(token)
+    except JWTError:
+        return None
+    return payload.get("sub") if payload.get("scope") == "access_token" else None
+
+
+async def get_session_factory(request: Request):
+    """function choose the replica for safe-method requests of users without a recent write, else the primary"""
+    if ReplicaSessionLocal is None:
+        return AsyncSessionLocal
+    subject = token_subject(request)
+    if request.method not in SAFE_METHODS:
+        if subject is not None:
+            await stickiness.mark(subject)
+        return AsyncSessionLocal
+    if subject is not None and await stickiness.is_sticky(subject):
+        return AsyncSessionLocal
+    return ReplicaSessionLocal
+
+
+def is_replica_session(session: AsyncSession) -> bool:
+    """function tell whether a session reads from the replica, whose data may lag behind the primary"""
+    return session.info.get("replica", False)
+
+
+async def async_get_routed_database(request: Request,
+                                    db: AsyncSession = Depends(async_get_database)) -> AsyncSession:
+    """function yield a replica session or the request's primary session, which get_current_user shares"""
+    session_factory = await get_session_factory(request)
+    if session_factory is AsyncSessionLocal:
+        yield db
+    else:
+        async with session_factory() as session:
+            session.info["replica"] = True
+            yield session
+    if ReplicaSessionLocal is not None and request.method not in SAFE_METHODS:
+        # restart the window from the end of the write, not only from its start
+        subject = token_subject(request)
+        if subject is not None:
+            await stickiness.mark(subject)
@@ -1,92 +1,433 @@
-from typing import List, Optional
+import base64
+import calendar
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
 from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from sqlalchemy import and_
+from sqlalchemy import and_, bindparam, case, delete, func, insert, or_, update
 
-from My_project.database.models import Contact, PhoneNumber, Email, User
-from My_project.schemas import ContactCreate, ContactUpdate
+from My_project.database.models import Contact, PhoneNumber, Email, User, utcnow
+from My_project.schemas import ContactCreate, ContactUpdate, ContactBatchOperation
+from My_project.services.response_cache import response_cache
+from My_project.services.dedup import DuplicateFinder
+from My_project.services.normalize import normalize_email, normalize_phone
 
-async def get_contacts(skip: int, limit: int, user: User, db: AsyncSession) -> List[Contact]:
-    """function takes contacts by list"""
-    user_instance = await user
-    user_id = user_instance.id
-    query = select(Contact).filter(Contact.user_id == user_id).offset(skip).limit(limit)
+def birthday_key(date_of_birthday: Optional[date]) -> Optional[int]:
+    """function build the month/day key used to index birthdays"""
+    if date_of_birthday is None:
+        return None
+    return date_of_birthday.month * 100 + date_of_birthday.day
+
+def encode_cursor(contact_id: int | str) -> str:
+    """function encode contact ID into an opaque cursor"""
+    return base64.urlsafe_b64encode(str(contact_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """function decode opaque cursor into contact ID"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def encode_sync_token(change_seq: int, contact_id: int) -> str:
+    """function encode the position of the last change into an opaque sync token"""
+    return encode_cursor(f"{change_seq}:{contact_id}")
+
+def decode_sync_token(token: str) -> Tuple[int, int]:
+    """function decode sync token into (change sequence number, contact ID)"""
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        change_seq, contact_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        return int(change_seq), int(contact_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid sync token") from e
+
+async def next_change_seq(user: User, db: AsyncSession) -> int:
+    """function take the user's next change sequence number inside the current transaction.
+
+    The UPDATE keeps the user row locked until commit, so writers of one user
+    commit in the order of their numbers and a reader that has seen number n
+    can never miss a change numbered n or lower. Take it before the first
+    write of the transaction, so every writer locks the user row first.
+    """
+    result = await db.execute(update(User).where(User.id == user.id)
+                              .values(contact_change_seq=User.contact_change_seq + 1)
+                              .returning(User.contact_change_seq)
+                              .execution_options(synchronize_session=False))
+    return result.scalar_one()
+
+CONTACT_COLUMNS = (Contact.id, Contact.first_name, Contact.last_name,
+                   Contact.date_of_birthday, Contact.additional_data)
+
+async def _attach_children(rows: List[dict], db: AsyncSession) -> List[dict]:
+    """function add phone numbers and emails to contact rows with one query per child table"""
+    by_id = {row["id"]: row for row in rows}
+    for row in rows:
+        row["phone_numbers"] = []
+        row["emails"] = []
+    if not by_id:
+        return rows
+
+    phones = await db.execute(select(PhoneNumber.contact_id, PhoneNumber.phone_number, PhoneNumber.id)
+                              .filter(PhoneNumber.contact_id.in_(by_id)).order_by(PhoneNumber.id))
+    for contact_id, phone_number, phone_id in phones:
+        by_id[contact_id]["phone_numbers"].append({"phone_number": phone_number, "id": phone_id})
+    emails = await db.execute(select(Email.contact_id, Email.email, Email.id)
+                              .filter(Email.contact_id.in_(by_id)).order_by(Email.id))
+    for contact_id, email, email_id in emails:
+        by_id[contact_id]["emails"].append({"email": email, "id": email_id})
+    return rows
+
+async def get_contacts(skip: int, limit: int, user: User, db: AsyncSession,
+                       after_id: Optional[int] = None) -> List[dict]:
+    """function takes contacts by list, by offset or after the given contact ID.
+
+    Returns plain dicts shaped like ContactResponse, built from Core rows
+    without ORM identity-map hydration.
+    """
+    query = (select(*CONTACT_COLUMNS)
+             .filter(Contact.user_id == user.id, Contact.deleted_at.is_(None))
+             .order_by(Contact.id)
+             .limit(limit))
+    if after_id is not None:
+        query = query.filter(Contact.id > after_id)
+    else:
+        query = query.offset(skip)
     result = await db.execute(query)
-    contacts = result.scalars().all()
-    return contacts
+    rows = [dict(row) for row in result.mappings()]
+    return await _attach_children(rows, db)
 
 async def get_contact(contact_id: int, user: User, db: AsyncSession) -> Optional[Contact]:
     """function get contact by ID"""
-
-    user_instance = await user
-    user_id = user_instance.id
-
-    query = select(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user_id))
+    query = (select(Contact)
+             .options(selectinload(Contact.phone_numbers), selectinload(Contact.emails))
+             .filter(and_(Contact.id == contact_id, Contact.user_id == user.id, Contact.deleted_at.is_(None))))
     result = await db.execute(query)
     contact = result.scalars().first()
     return contact
 
+async def search_contacts(q: str, limit: int, user: User, db: AsyncSession) -> List[Contact]:
+    """function search user contacts by name, email or phone number, best matches first"""
+    term = q.strip().lower()
+    # scoped to the user, so a short term does not scan other users' phone numbers and emails
+    phone_matches = (select(PhoneNumber.contact_id)
+                     .join(Contact, and_(Contact.id == PhoneNumber.contact_id, Contact.user_id == user.id))
+                     .filter(PhoneNumber.phone_number.icontains(term, autoescape=True)))
+    email_matches = (select(Email.contact_id)
+                     .join(Contact, and_(Contact.id == Email.contact_id, Contact.user_id == user.id))
+                     .filter(Email.email.icontains(term, autoescape=True)))
+    conditions = [
+        Contact.first_name.icontains(term, autoescape=True),
+        Contact.last_name.icontains(term, autoescape=True),
+        Contact.id.in_(phone_matches),
+        Contact.id.in_(email_matches)
+    ]
+    query = (select(Contact)
+             .options(selectinload(Contact.phone_numbers), selectinload(Contact.emails))
+             .limit(limit))
+
+    if db.get_bind().dialect.name == "postgresql":
+        # pg_trgm: "%" matches misspelled names, similarity() ranks; ILIKE and "%" both use the trigram indexes
+        conditions += [Contact.first_name.op("%")(term), Contact.last_name.op("%")(term)]
+        rank = func.greatest(func.similarity(Contact.first_name, term), func.similarity(Contact.last_name, term))
+        query = query.order_by(rank.desc(), Contact.id)
+    else:
+        query = query.order_by(Contact.id)
+
+    query = query.filter(and_(Contact.user_id == user.id, Contact.deleted_at.is_(None), or_(*conditions)))
+    result = await db.execute(query)
+    return result.scalars().all()
+
+async def lookup_contacts(user: User, db: AsyncSession, phone: Optional[str] = None,
+                          email: Optional[str] = None, limit: int = 20) -> List[Contact]:
+    """function find user contacts by phone number or email through the normalized value indexes"""
+    if phone is not None:
+        key = normalize_phone(phone)
+        matches = select(PhoneNumber.contact_id).filter(PhoneNumber.phone_normalized == key)
+    else:
+        key = normalize_email(email)
+        matches = select(Email.contact_id).filter(Email.email_normalized == key)
+    if key is None:
+        # "== None" would compile to IS NULL and match every blank value
+        return []
+    query = (select(Contact)
+             .options(selectinload(Contact.phone_numbers), selectinload(Contact.emails))
+             .filter(Contact.user_id == user.id, Contact.deleted_at.is_(None), Contact.id.in_(matches))
+             .order_by(Contact.id)
+             .limit(limit))
+    result = await db.execute(query)
+    return result.scalars().all()
+
+async def get_upcoming_birthdays(days: int, skip: int, limit: int, user: User, db: AsyncSession,
+                                 today: Optional[date] = None) -> List[Contact]:
+    """function get contacts with birthdays within the next days, nearest first"""
+    today = today or date.today()
+    start = birthday_key(today)
+    query = (select(Contact)
+             .options(selectinload(Contact.phone_numbers), selectinload(Contact.emails))
+             .filter(Contact.user_id == user.id, Contact.deleted_at.is_(None), Contact.birthday_key.is_not(None)))
+
+    if days < 365:
+        end_date = today + timedelta(days=days)
+        end = birthday_key(end_date)
+        # in common years Feb 29 birthdays are celebrated on Feb 28
+        if end == 228 and not calendar.isleap(end_date.year):
+            end = 229
+        if end_date.year == today.year:
+            query = query.filter(Contact.birthday_key.between(start, end))
+        else:
+            query = query.filter(or_(Contact.birthday_key >= start, Contact.birthday_key <= end))
+
+    # keys after the year wrap-around come last
+    query = (query
+             .order_by(case((Contact.birthday_key >= start, 0), else_=1), Contact.birthday_key, Contact.id)
+             .offset(skip)
+             .limit(limit))
+    result = await db.execute(query)
+    return result.scalars().all()
+
+async def stream_contacts(user: User, db: AsyncSession, batch_size: int = 500) -> AsyncIterator[List[Contact]]:
+    """function stream all user contacts in batches over a server-side cursor"""
+    query = (select(Contact)
+             .options(selectinload(Contact.phone_numbers), selectinload(Contact.emails))
+             .filter(Contact.user_id == user.id, Contact.deleted_at.is_(None))
+             .order_by(Contact.id)
+             .execution_options(yield_per=batch_size))
+    result = await db.stream_scalars(query)
+    async for contacts in result.partitions():
+        yield contacts
+
+async def get_changes(user: User, db: AsyncSession, since: Optional[Tuple[int, int]],
+                      limit: int) -> Tuple[List[Contact], bool]:
+    """function get contacts changed after the (change sequence number, ID) position, oldest change first.
+
+    Returns the page and whether more changes follow.
+    """
+    query = (select(Contact)
+             .options(selectinload(Contact.phone_numbers), selectinload(Contact.emails))
+             .filter(Contact.user_id == user.id)
+             .order_by(Contact.change_seq, Contact.id)
+             .limit(limit + 1))
+    if since is None:
+        # first sync: tombstones of contacts the client never had are useless
+        query = query.filter(Contact.deleted_at.is_(None))
+    else:
+        change_seq, contact_id = since
+        query = query.filter(or_(Contact.change_seq > change_seq,
+                                 and_(Contact.change_seq == change_seq, Contact.id > contact_id)))
+    result = await db.execute(query)
+    contacts = result.scalars().all()
+    return contacts[:limit], len(contacts) > limit
+
 async def create_contact(body: ContactCreate, user: User, db: AsyncSession) -> Contact:
     """function create new contact"""
-    user_instance = await user
-    user_id = user_instance.id
     contact = Contact(
         first_name=body.first_name,
         last_name=body.last_name,
         date_of_birthday=body.date_of_birthday,
+        birthday_key=birthday_key(body.date_of_birthday),
         additional_data=body.additional_data,
         phone_numbers=[PhoneNumber(phone_number=phone.phone_number) for phone in body.phone_numbers],
         emails=[Email(email=email.email) for email in body.emails],
-        user_id=user_id
+        user_id=user.id,
+        change_seq=await next_change_seq(user, db)
     )
     db.add(contact)
     await db.commit()
-    await db.refresh(contact)
+    await response_cache.bump(user.id)
     return contact
 
+async def create_contacts(bodies: List[ContactCreate], user: User, db: AsyncSession) -> List[int]:
+    """function create many contacts with multi-row inserts in one transaction"""
+    change_seq = await next_change_seq(user, db)
+    result = await db.execute(
+        insert(Contact).returning(Contact.id, sort_by_parameter_order=True),
+        [{
+            "first_name": body.first_name,
+            "last_name": body.last_name,
+            "date_of_birthday": body.date_of_birthday,
+            "birthday_key": birthday_key(body.date_of_birthday),
+            "additional_data": body.additional_data,
+            "user_id": user.id,
+            "change_seq": change_seq
+        } for body in bodies]
+    )
+    contact_ids = result.scalars().all()
+
+    phone_numbers = [{"phone_number": phone.phone_number, "contact_id": contact_id}
+                     for body, contact_id in zip(bodies, contact_ids) for phone in body.phone_numbers]
+    emails = [{"email": email.email, "contact_id": contact_id}
+              for body, contact_id in zip(bodies, contact_ids) for email in body.emails]
+    if phone_numbers:
+        await db.execute(insert(PhoneNumber), phone_numbers)
+    if emails:
+        await db.execute(insert(Email), emails)
+    await db.commit()
+    await response_cache.bump(user.id)
+    return contact_ids
+
+def _sync_children(children: list, submitted: List[str], attribute: str, factory) -> None:
+    """function keep stored children that are still submitted, drop the rest and add the new values"""
+    wanted = Counter(submitted)
+    for child in list(children):
+        value = getattr(child, attribute)
+        if wanted[value] > 0:
+            wanted[value] -= 1
+        else:
+            children.remove(child)
+    for value in submitted:
+        if wanted[value] > 0:
+            wanted[value] -= 1
+            children.append(factory(value))
+
 async def update_contact(contact_id: int, body: ContactUpdate, user: User, db: AsyncSession) -> Optional[Contact]:
-    """function update contact"""
+    """function update contact, rewriting only changed phone numbers and emails"""
     contact = await get_contact(contact_id, user, db)
     if contact:
+        contact.change_seq = await next_change_seq(user, db)
         if body.first_name is not None:
             contact.first_name = body.first_name
         if body.last_name is not None:
             contact.last_name = body.last_name
         if body.date_of_birthday is not None:
             contact.date_of_birthday = body.date_of_birthday
+            contact.birthday_key = birthday_key(body.date_of_birthday)
         if body.additional_data is not None:
             contact.additional_data = body.additional_data
 
-        phone_number = select(PhoneNumber).filter(PhoneNumber.contact_id == contact.id)
-        result = await db.execute(phone_number)
-        result = result.scalars().first()
-        await db.delete(result)
-
-        for phone in body.phone_numbers:
-            new_phone_number = PhoneNumber(phone_number=phone.phone_number, contact_id=contact.id)
-            db.add(new_phone_number)
-
-        email_db = select(Email).filter(Email.contact_id == contact.id)
-        result = await db.execute(email_db)
-        result = result.scalars().first()
-        await db.delete(result)
-
-        for email in body.emails:
-            new_email = Email(email=email.email, contact_id=contact.id)
-            db.add(new_email)
+        if body.phone_numbers is not None:
+            _sync_children(contact.phone_numbers, [phone.phone_number for phone in body.phone_numbers],
+                           "phone_number", lambda value: PhoneNumber(phone_number=value))
+        if body.emails is not None:
+            _sync_children(contact.emails, [email.email for email in body.emails],
+                           "email", lambda value: Email(email=value))
 
+        # child changes alone do not trigger the onupdate of the contact row
+        contact.updated_at = utcnow()
         await db.commit()
-        await db.refresh(contact)
-
-
+        await response_cache.bump(user.id)
     return contact
 
 async def remove_contact(contact_id: int, user: User, db: AsyncSession) -> Optional[Contact]:
-    """function delete contact"""
+    """function delete contact, leaving a tombstone for the changes feed"""
     contact = await get_contact(contact_id, user, db)
     if contact:
-        await db.delete(contact)
+        contact.change_seq = await next_change_seq(user, db)
+        contact.deleted_at = contact.updated_at = utcnow()
+        await db.commit()
+        await response_cache.bump(user.id)
+    return contact
+
+async def apply_contact_batch(operations: List[ContactBatchOperation], user: User, db: AsyncSession) -> List[dict]:
+    """function apply contact updates and deletes with set-based statements in one transaction"""
+    requested_ids = {operation.contact_id for operation in operations}
+    result = await db.execute(select(Contact.id).filter(Contact.user_id == user.id, Contact.deleted_at.is_(None),
+                                                        Contact.id.in_(requested_ids)))
+    owned_ids = set(result.scalars().all())
+
+    delete_ids = {operation.contact_id for operation in operations
+                  if operation.op == "delete" and operation.contact_id in owned_ids}
+    now = utcnow()
+    updates = {}
+    results = []
+    for operation in operations:
+        status = "not_found"
+        if operation.contact_id in delete_ids:
+            status = "deleted"
+        elif operation.contact_id in owned_ids:
+            values = operation.data.model_dump(exclude_unset=True) if operation.data else {}
+            if "date_of_birthday" in values:
+                values["birthday_key"] = birthday_key(values["date_of_birthday"])
+            status = "updated" if values else "unchanged"
+            if values:
+                updates.setdefault(operation.contact_id, {"id": operation.contact_id, "updated_at": now}).update(values)
+        results.append({"contact_id": operation.contact_id, "op": operation.op, "status": status})
+
+    if updates or delete_ids:
+        change_seq = await next_change_seq(user, db)
+    if updates:
+        for values in updates.values():
+            values["change_seq"] = change_seq
+        # ORM bulk UPDATE by primary key, grouped by the set of changed columns
+        await db.execute(update(Contact).where(Contact.user_id == user.id)
+                         .execution_options(synchronize_session=False), list(updates.values()))
+    if delete_ids:
+        await db.execute(update(Contact).where(Contact.user_id == user.id, Contact.id.in_(delete_ids))
+                         .values(deleted_at=now, updated_at=now, change_seq=change_seq)
+                         .execution_options(synchronize_session=False))
+    await db.commit()
+    if updates or delete_ids:
+        await response_cache.bump(user.id)
+    return results
+
+def _batches(values: list, batch_size: int):
+    for start in range(0, len(values), batch_size):
+        yield values[start:start + batch_size]
+
+async def dedup_contacts(user: User, db: AsyncSession, dry_run: bool = True,
+                         batch_size: int = 1000, examples: int = 20) -> dict:
+    """function merge contacts sharing a normalized phone number or email into the one with the lowest ID.
+
+    Phone numbers and emails are streamed once into a hash index; children of
+    the losers move to the winner, repeated values are dropped and the losers
+    become tombstones, all with batched statements in one transaction.
+    """
+    started = time.perf_counter()
+    finder = DuplicateFinder()
+    sources = (("phone", PhoneNumber.phone_number, PhoneNumber, normalize_phone),
+               ("email", Email.email, Email, normalize_email))
+    for kind, column, model, normalize in sources:
+        query = (select(model.id, model.contact_id, column)
+                 .join(Contact, Contact.id == model.contact_id)
+                 .filter(Contact.user_id == user.id, Contact.deleted_at.is_(None))
+                 .order_by(model.id)
+                 .execution_options(yield_per=batch_size * 10))
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            for child_id, contact_id, value in rows:
+                finder.add(kind, normalize(value), contact_id, child_id)
+
+    groups = finder.groups()
+    redundant = finder.redundant_children(set(groups))
+    report = {
+        "dry_run": dry_run,
+        "groups": len(groups),
+        "contacts_merged": sum(len(losers) for losers in groups.values()),
+        "phone_numbers_removed": len(redundant["phone"]),
+        "emails_removed": len(redundant["email"]),
+        "examples": [{"winner": winner, "losers": losers} for winner, losers in list(groups.items())[:examples]],
+    }
+    if not dry_run and groups:
+        change_seq = await next_change_seq(user, db)
+        for model, child_ids in ((PhoneNumber, redundant["phone"]), (Email, redundant["email"])):
+            for batch in _batches(child_ids, batch_size):
+                await db.execute(delete(model).where(model.id.in_(batch))
+                                 .execution_options(synchronize_session=False))
+
+        moves = [{"loser_id": loser, "winner_id": winner} for winner, losers in groups.items() for loser in losers]
+        for table in (PhoneNumber.__table__, Email.__table__):
+            statement = (update(table).where(table.c.contact_id == bindparam("loser_id"))
+                         .values(contact_id=bindparam("winner_id")))
+            for batch in _batches(moves, batch_size):
+                await db.execute(statement, batch)
+
+        now = utcnow()
+        for batch in _batches(list(groups), batch_size):
+            await db.execute(update(Contact).where(Contact.user_id == user.id, Contact.id.in_(batch))
+                             .values(updated_at=now, change_seq=change_seq)
+                             .execution_options(synchronize_session=False))
+        loser_ids = [move["loser_id"] for move in moves]
+        for batch in _batches(loser_ids, batch_size):
+            await db.execute(update(Contact).where(Contact.user_id == user.id, Contact.id.in_(batch))
+                             .values(deleted_at=now, updated_at=now, change_seq=change_seq)
+                             .execution_options(synchronize_session=False))
         await db.commit()
-    return contact
\ No newline at end of file
+        await response_cache.bump(user.id)
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return report
@@ -1,9 +1,9 @@
-from libgravatar import Gravatar
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from My_project.database.models import User
 from My_project.schemas import UserModel
+from My_project.services.user_cache import user_cache
 
 async def get_user_by_email(email: str, db: AsyncSession) -> User:
     """function to get user by email"""
@@ -12,34 +12,25 @@ async def get_user_by_email(email: str, db: AsyncSession) -> User:
     return result.scalars().first()
 
 async def create_user(body: UserModel, db: AsyncSession) -> User:
-    """function create new user"""
-    avatar = None
-    try:
-        g = Gravatar(body.email)
-        avatar = g.get_image()
-    except Exception as e:
-        print(e)
-    new_user = User(**body.model_dump(), avatar=avatar)
+    """function create new user; the Gravatar URL is derived from the email when serialized"""
+    new_user = User(**body.model_dump())
     db.add(new_user)
     await db.commit()
     await db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: AsyncSession) -> None:
-    """function update token"""
-    user.refresh_token = token
-    await db.commit()
-
 async def confirmed_email(email: str, db: AsyncSession) -> None:
     """function confirmed email"""
     user = await get_user_by_email(email, db)
     user.confirmed = True
     await db.commit()
+    await user_cache.invalidate(email)
 
 async def update_avatar(email, url: str, db: AsyncSession) -> User:
     """function update avatar"""
     user = await get_user_by_email(email, db)
     user.avatar = url
     await db.commit()
+    await user_cache.invalidate(email)
     return user
@@ -2,13 +2,11 @@ from fastapi import APIRouter, HTTPException, Depends, status, Security, Backgro
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi_limiter.depends import RateLimiter
-
 from My_project.database.database import async_get_database
 from My_project.database.models import User
-from My_project.services.auth import (create_access_token, create_refresh_token,
-                                      get_email_from_refresh_token, get_current_user, Hash,
-                                      get_email_from_token)
+from My_project.services.rate_limit import RateLimiter
+from My_project.services.auth import create_access_token, get_current_user, Hash, get_email_from_token
+from My_project.services.refresh_tokens import refresh_tokens
 from My_project.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 from My_project.repository import users as repository_users
 
@@ -25,7 +23,7 @@ async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Re
     exist_user = await repository_users.get_user_by_email(body.email, db)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = hash.get_password_hash(body.password)
+    body.password = await hash.get_password_hash_async(body.password)
     new_user = await repository_users.create_user(body, db)
 
     background_tasks.add_task(send_email,
@@ -47,14 +45,13 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession =
     user_exist = await repository_users.get_user_by_email(body.username, db)
     if user_exist is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
-    if not hash.verify_password(body.password, user_exist.password):
+    if not await hash.verify_password_async(body.password, user_exist.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
     if not user_exist.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
     
     access_token = await create_access_token(data={"sub": user_exist.email})
-    refresh_token = await create_refresh_token(data={"sub": user_exist.email})
-    await repository_users.update_token(user_exist, refresh_token, db)
+    refresh_token = await refresh_tokens.issue(user_exist.email)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @router.get('/confirmed_email/{token}',
@@ -90,19 +87,17 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
 @router.get('/refresh_token', response_model=TokenModel,
             description="No more than 10 requests per minute",
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: AsyncSession = Depends(async_get_database)):
-    token = credentials.credentials
-    email = await get_email_from_refresh_token(token)
-    user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
-
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+    email, refresh_token = await refresh_tokens.rotate(credentials.credentials)
     access_token = await create_access_token(data={"sub": email})
-    refresh_token = await create_refresh_token(data={"sub": email})
-    await repository_users.update_token(user, refresh_token, db)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT,
+             description="No more than 10 requests per minute",
+             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def logout(credentials: HTTPAuthorizationCredentials = Security(security)):
+    await refresh_tokens.revoke(credentials.credentials)
+
 @router.get("/secret")
 async def read_item(current_user: User = Depends(get_current_user)):
     return {"message": 'secret router', "owner": current_user.email}
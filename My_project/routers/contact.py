@@ -1,45 +1,164 @@
-from typing import List
+import time
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi_limiter.depends import RateLimiter
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.responses import StreamingResponse
+import orjson
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from My_project.database.database import async_get_database
-from My_project.schemas import ContactCreate, ContactResponse
+from My_project.database.routing import async_get_routed_database, get_session_factory, is_replica_session
+from My_project.schemas import (ContactCreate, ContactResponse, BulkImportResponse, BulkRowError,
+                                ContactBatchRequest, ContactBatchResponse, ContactResponseAdapter, DedupResponse,
+                                ContactChangesResponse)
 from My_project.repository import contact as repository_contact
 from My_project.database.models import User
+from My_project.services.rate_limit import RateLimiter
 from My_project.services.auth import get_current_user
+from My_project.services.contact_import import ImportDecodeError, RowError, get_parser
+from My_project.services.contact_export import export_contacts
+from My_project.services.response_cache import response_cache
+from My_project.services.normalize import normalize_email, normalize_phone
+
+SEARCH_MIN_LENGTH = 3
 
 router = APIRouter(prefix="/contact")
 
 @router.get("/", response_model=List[ContactResponse],
             description="No more than 10 requests per minute",
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def read_contacts(skip: int = 0,
-                        limit: int = 100,
-                        db: AsyncSession = Depends(async_get_database),
+async def read_contacts(request: Request,
+                        skip: int = Query(0, ge=0),
+                        limit: int = Query(100, ge=1, le=1000),
+                        cursor: Optional[str] = None,
+                        db: AsyncSession = Depends(async_get_routed_database),
                         current_user: User = Depends(get_current_user)):
-    contacts = await repository_contact.get_contacts(skip, limit, current_user, db)
-    return contacts
+    cache_key, cached = await response_cache.get(current_user.id, "contacts", request)
+    if cached is not None:
+        return response_cache.respond(request, cached)
+
+    after_id = None
+    if cursor is not None:
+        try:
+            after_id = repository_contact.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    contacts = await repository_contact.get_contacts(skip, limit, current_user, db, after_id)
+    headers = {}
+    if contacts and len(contacts) == limit:
+        headers["X-Next-Cursor"] = repository_contact.encode_cursor(contacts[-1]["id"])
+    body = orjson.dumps(contacts).decode()
+    # a lagging replica must not fill the cache under the current version
+    entry = await response_cache.set(None if is_replica_session(db) else cache_key, body, headers)
+    return response_cache.respond(request, entry)
+
+@router.get("/search", response_model=List[ContactResponse],
+            description="No more than 10 requests per minute",
+            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def search_contacts(q: str = Query(min_length=SEARCH_MIN_LENGTH, max_length=64),
+                          limit: int = Query(20, ge=1, le=100),
+                          db: AsyncSession = Depends(async_get_routed_database),
+                          current_user: User = Depends(get_current_user)):
+    if len(q.strip()) < SEARCH_MIN_LENGTH:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"Search term must have at least {SEARCH_MIN_LENGTH} characters")
+    return await repository_contact.search_contacts(q, limit, current_user, db)
+
+@router.get("/lookup", response_model=List[ContactResponse],
+            description="No more than 10 requests per minute",
+            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def lookup_contacts(phone: Optional[str] = Query(None, min_length=1, max_length=32),
+                          email: Optional[str] = Query(None, min_length=1, max_length=128),
+                          db: AsyncSession = Depends(async_get_routed_database),
+                          current_user: User = Depends(get_current_user)):
+    if (phone is None) == (email is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass either phone or email")
+    if phone is not None and normalize_phone(phone) is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Phone number has no digits")
+    if email is not None and normalize_email(email) is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email is blank")
+    return await repository_contact.lookup_contacts(current_user, db, phone=phone, email=email)
+
+@router.get("/changes", response_model=ContactChangesResponse,
+            description="No more than 10 requests per minute",
+            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def read_contact_changes(since: Optional[str] = None,
+                               limit: int = Query(500, ge=1, le=5000),
+                               db: AsyncSession = Depends(async_get_routed_database),
+                               current_user: User = Depends(get_current_user)):
+    position = None
+    if since is not None:
+        try:
+            position = repository_contact.decode_sync_token(since)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    contacts, has_more = await repository_contact.get_changes(current_user, db, position, limit)
+    next_token = since
+    if contacts:
+        next_token = repository_contact.encode_sync_token(contacts[-1].change_seq, contacts[-1].id)
+    return {
+        "upserts": [contact for contact in contacts if contact.deleted_at is None],
+        "deleted": [contact.id for contact in contacts if contact.deleted_at is not None],
+        "next_token": next_token,
+        "has_more": has_more
+    }
+
+@router.get("/birthdays", response_model=List[ContactResponse],
+            description="No more than 10 requests per minute",
+            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def read_upcoming_birthdays(days: int = Query(7, ge=0, le=366),
+                                  skip: int = 0,
+                                  limit: int = Query(100, ge=1, le=1000),
+                                  db: AsyncSession = Depends(async_get_routed_database),
+                                  current_user: User = Depends(get_current_user)):
+    return await repository_contact.get_upcoming_birthdays(days, skip, limit, current_user, db)
+
+@router.get("/export", response_class=StreamingResponse,
+            description="No more than 10 requests per minute",
+            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def export_contacts_stream(request: Request,
+                                 export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+                                 current_user: User = Depends(get_current_user)):
+    session_factory = await get_session_factory(request)
+
+    async def content():
+        # The request-scoped session is closed before the body is streamed, so the export owns its session.
+        async with session_factory() as db:
+            batches = repository_contact.stream_contacts(current_user, db)
+            async for chunk in export_contacts(batches, export_format):
+                yield chunk
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(content(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="contacts.{export_format}"'})
 
 @router.get("/{contact_id}", response_model=ContactResponse,
             description="No more than 10 requests per minute",
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
 async def read_contact(contact_id: int,
-                       db: AsyncSession = Depends(async_get_database),
+                       request: Request,
+                       db: AsyncSession = Depends(async_get_routed_database),
                        current_user: User = Depends(get_current_user)):
+    cache_key, cached = await response_cache.get(current_user.id, f"contact/{contact_id}", request)
+    if cached is not None:
+        return response_cache.respond(request, cached)
+
     contact = await repository_contact.get_contact(contact_id, current_user, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return contact
+    body = ContactResponseAdapter.dump_json(
+        ContactResponseAdapter.validate_python(contact, from_attributes=True)).decode()
+    entry = await response_cache.set(None if is_replica_session(db) else cache_key, body)
+    return response_cache.respond(request, entry)
 
 @router.post("/", response_model=ContactResponse,
              description="No more than 10 requests per minute",
              dependencies=[Depends(RateLimiter(times=10, seconds=60))])
 async def create_contact(
     body: ContactCreate,
-    db: AsyncSession = Depends(async_get_database),
+    db: AsyncSession = Depends(async_get_routed_database),
     current_user: User = Depends(get_current_user)
 ):
     return await repository_contact.create_contact(body, current_user, db)
@@ -49,7 +168,7 @@ async def create_contact(
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
 async def update_contact(contact_id: int,
                          body: ContactCreate,
-                         db: AsyncSession = Depends(async_get_database),
+                         db: AsyncSession = Depends(async_get_routed_database),
                          current_user: User = Depends(get_current_user)):
     contact = await repository_contact.update_contact(contact_id, body, current_user, db)
     if contact is None:
@@ -60,9 +179,86 @@ async def update_contact(contact_id: int,
                description="No more than 10 requests per minute",
                dependencies=[Depends(RateLimiter(times=10, seconds=60))])
 async def remove_contact(contact_id: int,
-                         db: AsyncSession = Depends(async_get_database),
+                         db: AsyncSession = Depends(async_get_routed_database),
                          current_user: User = Depends(get_current_user)):
     contact = await repository_contact.remove_contact(contact_id, current_user, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
     return {"detail": "Contact successfully deleted"}
+
+@router.post("/bulk", response_model=BulkImportResponse,
+             description="No more than 10 requests per minute",
+             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def create_contacts_bulk(request: Request,
+                               batch_size: int = Query(500, ge=1, le=5000),
+                               db: AsyncSession = Depends(async_get_routed_database),
+                               current_user: User = Depends(get_current_user)):
+    parser = get_parser(request.headers.get("content-type", ""))
+    if parser is None:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Use application/x-ndjson or text/csv")
+    started = time.perf_counter()
+    created = 0
+    errors = []
+    batch, batch_rows = [], []
+    # a rollback expires current_user when it was loaded by this session; a detached owner survives it
+    owner = User(id=current_user.id)
+
+    async def flush():
+        nonlocal created
+        try:
+            await repository_contact.create_contacts(batch, owner, db)
+            created += len(batch)
+        except SQLAlchemyError as e:
+            await db.rollback()
+            errors.extend(BulkRowError(row=row, detail=f"Database error: {e.__class__.__name__}") for row in batch_rows)
+        batch.clear()
+        batch_rows.clear()
+
+    try:
+        async for row_number, row in parser(request.stream()):
+            if isinstance(row, RowError):
+                errors.append(BulkRowError(row=row_number, detail=row.detail))
+                continue
+            try:
+                batch.append(ContactCreate.model_validate(row))
+                batch_rows.append(row_number)
+            except ValidationError as e:
+                errors.append(BulkRowError(row=row_number, detail="; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+                    for error in e.errors())))
+            if len(batch) >= batch_size:
+                await flush()
+    except ImportDecodeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"{e}; {created} contacts were created before it")
+    if batch:
+        await flush()
+
+    errors.sort(key=lambda error: error.row)
+    elapsed = time.perf_counter() - started
+    return {
+        "created": created,
+        "failed": len(errors),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round((created + len(errors)) / elapsed, 1) if elapsed else 0.0
+    }
+
+@router.post("/batch", response_model=ContactBatchResponse,
+             description="No more than 10 requests per minute",
+             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def apply_contact_batch(body: ContactBatchRequest,
+                              db: AsyncSession = Depends(async_get_routed_database),
+                              current_user: User = Depends(get_current_user)):
+    results = await repository_contact.apply_contact_batch(body.operations, current_user, db)
+    return {"results": results}
+
+@router.post("/dedup", response_model=DedupResponse,
+             description="No more than 2 requests per minute",
+             dependencies=[Depends(RateLimiter(times=2, seconds=60))])
+async def dedup_contacts(dry_run: bool = True,
+                         batch_size: int = Query(1000, ge=1, le=10000),
+                         db: AsyncSession = Depends(async_get_routed_database),
+                         current_user: User = Depends(get_current_user)):
+    return await repository_contact.dedup_contacts(current_user, db, dry_run, batch_size)
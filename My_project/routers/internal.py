@@ -0,0 +1,26 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from My_project.database.database import pool_stats
+from My_project.services.diagnostics import diagnostics
+from My_project.services.internal_auth import require_internal_token
+
+router = APIRouter(prefix="/internal", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+
+@router.get("/pool")
+async def read_pool_stats():
+    """function read database connection pool statistics"""
+    return pool_stats()
+
+@router.get("/diagnostics")
+async def read_diagnostics():
+    """function read slow-query and N+1 diagnostics"""
+    return diagnostics.report()
+
+@router.patch("/diagnostics")
+async def update_diagnostics(enabled: Optional[bool] = None,
+                             slow_query_ms: Optional[float] = Query(None, ge=0),
+                             n_plus_one_threshold: Optional[int] = Query(None, ge=1)):
+    """function switch diagnostics and change thresholds at runtime"""
+    return diagnostics.configure(enabled, slow_query_ms, n_plus_one_threshold)
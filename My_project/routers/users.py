@@ -1,17 +1,9 @@
-from typing import List
-from os import environ
-from fastapi import APIRouter, Depends, UploadFile, File
-#from fastapi_limiter.depends import RateLimiter
-import cloudinary
-import cloudinary.uploader
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from My_project.database.database import async_get_database
 from My_project.database.models import User
-from My_project.repository import users as repository_users
 from My_project.services.auth import get_current_user
-from My_project.schemas import UserDBModel
+from My_project.services.avatar import avatar_pipeline
+from My_project.schemas import UserDBModel, AvatarJobResponse
 
 router = APIRouter(prefix="/users")
 
@@ -20,20 +12,36 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
     """function read user"""
     return current_user
 
-@router.patch("/avatar", response_model=UserDBModel)
-async def update_avatar_user(file: UploadFile = File(),
-                             current_user: User = Depends(get_current_user),
-                             db: AsyncSession = Depends(async_get_database)):
-    """function update avatar"""
-    cloudinary.config(
-        cloud_name=environ.get("CLOUDINARY_NAME"),
-        api_key=environ.get("CLOUDINARY_API_KEY"),
-        api_secret=environ.get("CLOUDINARY_API_SECRET"),
-        secure=True
-    )
-    result = cloudinary.uploader.upload(file.file,
-                                        public_id=f'My_project/{current_user.username}',
-                                        overwrite=True)
-    url = cloudinary.CloudinaryImage(f'My_project/{current_user.username}').build_url(width=250, height=250, crop='fill', version=result.get('version'))
-    user = await repository_users.update_avatar(current_user.email, url, db)
-    return user
\ No newline at end of file
+@router.patch("/avatar", response_model=AvatarJobResponse, status_code=status.HTTP_202_ACCEPTED,
+              openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+                  "type": "object", "required": ["file"],
+                  "properties": {"file": {"type": "string", "format": "binary"}}}}}}})
+async def update_avatar_user(request: Request,
+                             response: Response,
+                             current_user: User = Depends(get_current_user)):
+    """function update avatar in the background"""
+    try:
+        path = await avatar_pipeline.spool(request)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Avatar file is required")
+    # user IDs are unique and safe as file names, usernames are neither
+    job_id = await avatar_pipeline.submit(current_user.email, str(current_user.id), path)
+    status_url = str(request.url_for("read_avatar_status", job_id=job_id))
+    response.headers["Location"] = status_url
+    return {"job_id": job_id, "status": "pending", "status_url": status_url}
+
+@router.get("/avatar/{job_id}", response_model=AvatarJobResponse)
+async def read_avatar_status(job_id: str, request: Request, current_user: User = Depends(get_current_user)):
+    """function read avatar job status"""
+    job = await avatar_pipeline.status(job_id)
+    if job is None or job["owner"] != current_user.email:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar job not found")
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "status_url": str(request.url_for("read_avatar_status", job_id=job_id)),
+        "url": job.get("url"),
+        "detail": job.get("detail")
+    }
@@ -1,6 +1,8 @@
 from datetime import date
-from typing import List, Optional
-from pydantic import BaseModel, Field, EmailStr
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, TypeAdapter, field_validator, model_validator
+
+from My_project.services.gravatar import gravatar_url
 
 
 class PhoneNumberModel(BaseModel):
@@ -12,9 +14,7 @@ class PhoneNumberResponse(PhoneNumberModel):
     """Response model for phone number"""
     id: int
 
-    class Config:
-        """Class config"""
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class EmailModel(BaseModel):
@@ -26,9 +26,7 @@ class EmailResponse(EmailModel):
     """Response model for email"""
     id: int
 
-    class Config:
-        """Class config"""
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ContactBase(BaseModel):
@@ -54,10 +52,90 @@ class ContactUpdate(ContactBase):
 class ContactResponse(ContactBase):
     """Response model for contact"""
     id: int
+    phone_numbers: List[PhoneNumberResponse] = []
+    emails: List[EmailResponse] = []
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ContactPatch(BaseModel):
+    """Model for partial contact update in a batch"""
+    first_name: Optional[str] = Field(max_length=64, default=None)
+    last_name: Optional[str] = Field(max_length=64, default=None)
+    date_of_birthday: Optional[date] = None
+    additional_data: Optional[str] = Field(max_length=256, default=None)
+
+    @field_validator("first_name", "last_name", "date_of_birthday")
+    @classmethod
+    def not_null(cls, value):
+        """Leave out a field to keep it; only additional_data may be cleared with null"""
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+
+class ContactBatchOperation(BaseModel):
+    """Model for one operation of a contact batch"""
+    op: Literal["update", "delete"]
+    contact_id: int
+    data: Optional[ContactPatch] = None
+
+
+class ContactBatchRequest(BaseModel):
+    """Model for contact batch request"""
+    operations: List[ContactBatchOperation] = Field(min_length=1, max_length=10000)
+
+
+class ContactBatchResult(BaseModel):
+    """Result of one operation of a contact batch"""
+    contact_id: int
+    op: str
+    status: Literal["updated", "unchanged", "deleted", "not_found"]
+
+
+class ContactBatchResponse(BaseModel):
+    """Response model for contact batch"""
+    results: List[ContactBatchResult]
+
+
+class BulkRowError(BaseModel):
+    """Model for a rejected row of a bulk import"""
+    row: int
+    detail: str
+
+
+class BulkImportResponse(BaseModel):
+    """Response model for bulk contact import"""
+    created: int
+    failed: int
+    errors: List[BulkRowError]
+    elapsed_seconds: float
+    rows_per_second: float
+
 
-    class Config:
-        """Class config"""
-        orm_mode = True
+class ContactChangesResponse(BaseModel):
+    """Response model for the contact changes feed"""
+    upserts: List[ContactResponse]
+    deleted: List[int]
+    next_token: Optional[str]
+    has_more: bool
+
+
+class DedupGroup(BaseModel):
+    """Contacts found to be one person; the lowest ID is kept"""
+    winner: int
+    losers: List[int]
+
+
+class DedupResponse(BaseModel):
+    """Response model for contact deduplication"""
+    dry_run: bool
+    groups: int
+    contacts_merged: int
+    phone_numbers_removed: int
+    emails_removed: int
+    elapsed_seconds: float
+    examples: List[DedupGroup]
 
 
 class UserModel(BaseModel):
@@ -67,29 +145,40 @@ class UserModel(BaseModel):
     password: str = Field(min_length=8, max_length=255)
 
 
-class UserDBModel(BaseModel):
-    """Base model for user in database"""
-    id: int
+class UserAvatarModel(BaseModel):
+    """Base model for user with an avatar"""
     username: str
     email: str
-    avatar: str
+    avatar: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @model_validator(mode="after")
+    def default_avatar(self):
+        """Use the Gravatar URL when no avatar was uploaded"""
+        if not self.avatar:
+            self.avatar = gravatar_url(self.email)
+        return self
+
+
+class UserDBModel(UserAvatarModel):
+    """Base model for user in database"""
+    id: int
 
-    class Config:
-        """Class config"""
-        orm_mode = True
 
+class AvatarJobResponse(BaseModel):
+    """Response model for avatar processing job"""
+    job_id: str
+    status: Literal["pending", "done", "failed"]
+    status_url: str
+    url: Optional[str] = None
+    detail: Optional[str] = None
 
-class UserResponse(BaseModel):
+
+class UserResponse(UserAvatarModel):
     """Response model for user"""
-    username: str
-    email: str
-    avatar: str
     detail: str = "User successfully created"
 
-    class Config:
-        """Class config"""
-        orm_mode = True
-
 
 class TokenModel(BaseModel):
     """Base model for token"""
@@ -105,3 +194,8 @@ class EmailSchema(BaseModel):
 class RequestEmail(BaseModel):
     """Base model for email request"""
     email: EmailStr
+
+
+# built once at import; validate ORM objects and dump straight to JSON bytes
+ContactResponseAdapter = TypeAdapter(ContactResponse)
+ContactListAdapter = TypeAdapter(List[ContactResponse])
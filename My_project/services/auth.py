@@ -1,3 +1,8 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from os import environ
 from datetime import datetime, timedelta
 from typing import Optional
@@ -11,11 +16,30 @@ from starlette import status
 
 from My_project.database.database import async_get_database
 from My_project.repository.users import get_user_by_email
+from My_project.services.user_cache import user_cache
+
+
+HASH_EXECUTOR = environ.get("HASH_EXECUTOR", "thread")
+HASH_WORKERS = int(environ.get("HASH_WORKERS", 4))
+HASH_MAX_IN_FLIGHT = int(environ.get("HASH_MAX_IN_FLIGHT", 32))
+
+
+def _verify_password(plain_password, hashed_password):
+    return Hash.context.verify(plain_password, hashed_password)
+
+
+def _get_password_hash(password):
+    return Hash.context.hash(password)
 
 
 class Hash:
     """Class for hashing passwords"""
     context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    # bcrypt releases the GIL, so threads are enough; HASH_EXECUTOR=process isolates it completely
+    executor = (ProcessPoolExecutor(max_workers=HASH_WORKERS) if HASH_EXECUTOR == "process"
+                else ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt"))
+    in_flight = asyncio.Semaphore(HASH_MAX_IN_FLIGHT)
+    stats = {"waiting": 0, "running": 0, "completed": 0, "max_waiting": 0}
 
     def verify_password(self, plain_password, hashed_password):
         """Verify the provided password against the stored hashed password"""
@@ -25,12 +49,76 @@ class Hash:
         """Generate a hash for the provided password"""
         return self.context.hash(password)
 
+    async def _run(self, func, *args):
+        """Run a hashing function in the worker pool, at most HASH_MAX_IN_FLIGHT at a time"""
+        stats = self.stats
+        stats["waiting"] += 1
+        stats["max_waiting"] = max(stats["max_waiting"], stats["waiting"])
+        async with self.in_flight:
+            stats["waiting"] -= 1
+            stats["running"] += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+            finally:
+                stats["running"] -= 1
+                stats["completed"] += 1
+
+    async def verify_password_async(self, plain_password, hashed_password):
+        """Verify the password in the worker pool without blocking the event loop"""
+        return await self._run(_verify_password, plain_password, hashed_password)
+
+    async def get_password_hash_async(self, password: str):
+        """Generate a hash in the worker pool without blocking the event loop"""
+        return await self._run(_get_password_hash, password)
+
 
 SECRET_KEY = environ.get("SECRET_KEY")
 ALGORITHM = environ.get("ALGORITHM")
 
+TOKEN_CACHE_SIZE = int(environ.get("TOKEN_CACHE_SIZE", 10000))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+
+class TokenCache:
+    """Bounded LRU of already verified tokens mapped to their decoded claims.
+
+    Entries are keyed by the SHA-256 digest of the token and dropped once
+    their exp claim has passed. Only signature verification is skipped:
+    scope and revocation checks still run on every request.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def decode(self, token: str) -> dict:
+        """Return the claims of the token, raising JWTError like jwt.decode"""
+        digest = hashlib.sha256(token.encode()).digest()
+        payload = self._entries.get(digest)
+        if payload is not None:
+            if payload.get("exp", float("inf")) > time.time():
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return payload
+            del self._entries[digest]
+
+        self.misses += 1
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        self._entries[digest] = payload
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return payload
+
+    def stats(self) -> dict:
+        """Return cache counters"""
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
 async def create_access_token(data: dict, expires_delta: Optional[float] = None):
     """Create an access token"""
     to_encode = data.copy()
@@ -55,17 +143,6 @@ async def create_refresh_token(data: dict, expires_delta: Optional[float] = None
     encoded_refresh_token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_refresh_token
 
-async def get_email_from_refresh_token(refresh_token: str):
-    """Extract email from the provided refresh token"""
-    try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload['scope'] == 'refresh_token':
-            email = payload['sub']
-            return email
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid scope for token")
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(async_get_database)):
     """Get the current user from the token"""
     exception = HTTPException(
@@ -75,7 +152,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_cache.decode(token)
         if payload['scope'] == "access_token":
             email = payload.get("sub")
             if email is None:
@@ -85,9 +162,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     except JWTError:
         raise exception
 
-    user = get_user_by_email(email, db)
+    user = await user_cache.get(email)
     if user is None:
-        raise exception
+        generation = await user_cache.generation(email)
+        user = await get_user_by_email(email, db)
+        if user is None:
+            raise exception
+        await user_cache.set(user, generation)
     return user
 
 async def create_email_token(data: dict):
@@ -101,7 +182,7 @@ async def create_email_token(data: dict):
 async def get_email_from_token(token: str):
     """function get email from token"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_cache.decode(token)
         email = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid token payload")
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+from typing import Optional
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import Request
+from PIL import Image, ImageOps
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+
+from My_project.database.database import AsyncSessionLocal
+from My_project.repository import users as repository_users
+
+AVATAR_STORAGE = environ.get("AVATAR_STORAGE", "cloudinary")
+AVATAR_LOCAL_ROOT = environ.get("AVATAR_LOCAL_ROOT", "media/avatars")
+AVATAR_LOCAL_URL = environ.get("AVATAR_LOCAL_URL", "/media/avatars")
+AVATAR_WORKERS = int(environ.get("AVATAR_WORKERS", 2))
+AVATAR_MAX_BYTES = int(environ.get("AVATAR_MAX_BYTES", 10 * 1024 * 1024))
+# room for multipart boundaries and part headers around the file itself
+AVATAR_FORM_OVERHEAD = 64 * 1024
+AVATAR_JOB_TTL = int(environ.get("AVATAR_JOB_TTL", 3600))
+AVATAR_SIZE = (250, 250)
+CHUNK_SIZE = 64 * 1024
+
+
+class CloudinaryStorage:
+    """Avatar storage on Cloudinary"""
+
+    def __init__(self):
+        cloudinary.config(
+            cloud_name=environ.get("CLOUDINARY_NAME"),
+            api_key=environ.get("CLOUDINARY_API_KEY"),
+            api_secret=environ.get("CLOUDINARY_API_SECRET"),
+            secure=True
+        )
+
+    def save(self, path: str, name: str) -> str:
+        """Upload the image and return its URL (blocking)"""
+        result = cloudinary.uploader.upload(path, public_id=f'My_project/{name}', overwrite=True)
+        return cloudinary.CloudinaryImage(f'My_project/{name}').build_url(version=result.get('version'))
+
+
+class LocalStorage:
+    """Avatar storage in a local directory, for tests and development"""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def save(self, path: str, name: str) -> str:
+        """Copy the image into the storage directory and return its URL (blocking)"""
+        os.makedirs(self.root, exist_ok=True)
+        shutil.copyfile(path, os.path.join(self.root, f"{name}.png"))
+        return f"{self.base_url}/{name}.png?v={int(time.time())}"
+
+
+def get_storage():
+    """function choose avatar storage backend by AVATAR_STORAGE"""
+    if AVATAR_STORAGE == "local":
+        return LocalStorage(AVATAR_LOCAL_ROOT, AVATAR_LOCAL_URL)
+    return CloudinaryStorage()
+
+
+def resize_avatar(path: str) -> str:
+    """function crop and resize an image to the avatar size, returning the path of the PNG (blocking)"""
+    with Image.open(path) as image:
+        avatar = ImageOps.fit(ImageOps.exif_transpose(image).convert("RGBA"), AVATAR_SIZE)
+        resized_path = f"{path}.png"
+        avatar.save(resized_path, format="PNG")
+    return resized_path
+
+
+class AvatarPipeline:
+    """Avatar processing off the request path.
+
+    The upload is spooled to a temporary file; resizing and the storage
+    upload run in a thread pool, then the user row is updated. Job status
+    lives in Redis (or in process memory before init) for AVATAR_JOB_TTL.
+    """
+
+    def __init__(self, workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="avatar")
+        self.storage = None
+        self.redis = None
+        self.jobs = {}
+        self.tasks = set()
+
+    async def init(self, redis_client) -> None:
+        """Attach the Redis client used for job status"""
+        self.redis = redis_client
+
+    async def spool(self, request: Request, field: str = "file") -> Optional[str]:
+        """Stream the uploaded file of a multipart request into a temporary file and return its path.
+
+        A declared Content-Length over the limit is refused before anything
+        is read, and the body is counted while it arrives, so an oversized
+        upload fails with ValueError as soon as it crosses AVATAR_MAX_BYTES.
+        Returns None when the form has no file under field.
+        """
+        too_large = ValueError(f"Avatar is larger than {AVATAR_MAX_BYTES} bytes")
+        max_body = AVATAR_MAX_BYTES + AVATAR_FORM_OVERHEAD
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_body:
+            raise too_large
+
+        received = 0
+
+        async def receive():
+            nonlocal received
+            message = await request.receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    raise too_large
+            return message
+
+        async with Request(request.scope, receive).form(max_files=1) as form:
+            file = form.get(field)
+            if not isinstance(file, UploadFile):
+                return None
+            if file.size is not None and file.size > AVATAR_MAX_BYTES:
+                raise too_large
+            await file.seek(0)
+            spool = tempfile.NamedTemporaryFile(prefix="avatar-", delete=False)
+            try:
+                await run_in_threadpool(shutil.copyfileobj, file.file, spool, CHUNK_SIZE)
+            except BaseException:
+                spool.close()
+                os.remove(spool.name)
+                raise
+            spool.close()
+        return spool.name
+
+    async def submit(self, email: str, name: str, path: str) -> str:
+        """Schedule processing of a spooled upload and return the job ID"""
+        job_id = uuid.uuid4().hex
+        await self._set_status(job_id, {"owner": email, "status": "pending"})
+        task = asyncio.create_task(self._process(job_id, email, name, path))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job_id
+
+    async def status(self, job_id: str) -> Optional[dict]:
+        """Return the job status or None"""
+        if self.redis is None:
+            return self.jobs.get(job_id)
+        try:
+            raw = await self.redis.get(f"avatar:job:{job_id}")
+        except RedisError as e:
+            print(f"Avatar ---- {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def _set_status(self, job_id: str, job: dict) -> None:
+        if self.redis is None:
+            self.jobs[job_id] = job
+            return
+        try:
+            await self.redis.set(f"avatar:job:{job_id}", json.dumps(job), ex=AVATAR_JOB_TTL)
+        except RedisError as e:
+            print(f"Avatar ---- {e}")
+
+    async def _process(self, job_id: str, email: str, name: str, path: str) -> None:
+        loop = asyncio.get_running_loop()
+        resized_path = None
+        try:
+            if self.storage is None:
+                self.storage = get_storage()
+            resized_path = await loop.run_in_executor(self.executor, resize_avatar, path)
+            url = await loop.run_in_executor(self.executor, self.storage.save, resized_path, name)
+            async with AsyncSessionLocal() as db:
+                await repository_users.update_avatar(email, url, db)
+            await self._set_status(job_id, {"owner": email, "status": "done", "url": url})
+        except Exception as e:
+            print(f"Avatar ---- {e}")
+            await self._set_status(job_id, {"owner": email, "status": "failed", "detail": str(e)})
+        finally:
+            for leftover in (path, resized_path):
+                if leftover and os.path.exists(leftover):
+                    os.remove(leftover)
+
+
+avatar_pipeline = AvatarPipeline(AVATAR_WORKERS)
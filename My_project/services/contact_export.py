@@ -0,0 +1,46 @@
+import csv
+import io
+from typing import AsyncIterator, Iterable
+
+from My_project.database.models import Contact
+from My_project.schemas import ContactResponse
+from My_project.services.contact_import import CSV_LIST_SEPARATOR
+
+CSV_COLUMNS = ["id", "first_name", "last_name", "date_of_birthday", "additional_data", "phone_numbers", "emails"]
+
+
+def to_ndjson(contacts: Iterable[Contact]) -> str:
+    """function serialize a batch of contacts as NDJSON lines"""
+    return "".join(ContactResponse.model_validate(contact).model_dump_json() + "\n" for contact in contacts)
+
+
+def to_csv(contacts: Iterable[Contact], header: bool = False) -> str:
+    """function serialize a batch of contacts as CSV rows in the bulk import layout"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(CSV_COLUMNS)
+    for contact in contacts:
+        writer.writerow([
+            contact.id,
+            contact.first_name,
+            contact.last_name,
+            contact.date_of_birthday.isoformat() if contact.date_of_birthday else "",
+            contact.additional_data or "",
+            CSV_LIST_SEPARATOR.join(phone.phone_number for phone in contact.phone_numbers),
+            CSV_LIST_SEPARATOR.join(email.email for email in contact.emails)
+        ])
+    return buffer.getvalue()
+
+
+async def export_contacts(batches: AsyncIterator[list], export_format: str) -> AsyncIterator[str]:
+    """function turn batches of contacts into chunks of the requested export format"""
+    header = True
+    async for contacts in batches:
+        if export_format == "csv":
+            yield to_csv(contacts, header)
+            header = False
+        else:
+            yield to_ndjson(contacts)
+    if export_format == "csv" and header:
+        yield to_csv([], header)
@@ -0,0 +1,143 @@
+import csv
+import json
+from collections import deque
+from typing import Any, AsyncIterator, List, Tuple
+
+CSV_LIST_SEPARATOR = ";"
+
+
+class ImportDecodeError(ValueError):
+    """Raised when a line of an uploaded import is not valid UTF-8"""
+
+    def __init__(self, line_number: int):
+        super().__init__(f"Line {line_number} is not valid UTF-8")
+        self.line_number = line_number
+
+
+async def iter_lines(stream: AsyncIterator[bytes], keepends: bool = False) -> AsyncIterator[str]:
+    """function split a byte stream into text lines without buffering the whole body"""
+    buffer = b""
+    line_number = 0
+
+    def decode(line: bytes) -> str:
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            raise ImportDecodeError(line_number)
+        return text if keepends else text.rstrip("\r\n")
+
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield decode(line + b"\n")
+    if buffer:
+        line_number += 1
+        yield decode(buffer)
+
+
+class RowError:
+    """A row of an import that could not be parsed, yielded in place of the row"""
+    __slots__ = ("detail",)
+
+    def __init__(self, detail: str):
+        self.detail = detail
+
+
+class _LineFeed:
+    """Iterator handing a csv.reader the lines pushed into it"""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+def _next_record(reader, feed: _LineFeed) -> List[str] | RowError:
+    try:
+        return next(reader)
+    except csv.Error as e:
+        return RowError(f"Invalid CSV: {e}")
+    finally:
+        feed.lines.clear()
+
+
+async def iter_csv_records(stream: AsyncIterator[bytes]) -> AsyncIterator[List[str] | RowError]:
+    """function yield CSV records, or a RowError, through one csv.reader over the stream.
+
+    Lines are collected until their quotes balance, so the reader always gets
+    a whole record and quoted fields may contain newlines.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    quotes = 0
+    async for line in iter_lines(stream, keepends=True):
+        if not feed.lines and not line.strip():
+            continue
+        feed.lines.append(line)
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            quotes = 0
+            yield _next_record(reader, feed)
+    if feed.lines:
+        # an unterminated quoted field runs to the end of the body
+        yield _next_record(reader, feed)
+
+
+async def parse_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """function yield (row number, row) pairs from NDJSON, or a RowError instead of the row"""
+    row_number = 0
+    async for line in iter_lines(stream):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, RowError(f"Invalid JSON: {e.msg}")
+
+
+async def parse_csv(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, dict | RowError]]:
+    """function yield (row number, row) pairs from CSV with a header line.
+
+    phone_numbers and emails columns hold several values separated by ';'.
+    """
+    header = None
+    row_number = 0
+    async for values in iter_csv_records(stream):
+        if isinstance(values, RowError):
+            row_number += 1
+            yield row_number, values
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, RowError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        row = dict(zip(header, values))
+        row["phone_numbers"] = [{"phone_number": value.strip()}
+                                for value in row.get("phone_numbers", "").split(CSV_LIST_SEPARATOR) if value.strip()]
+        row["emails"] = [{"email": value.strip()}
+                         for value in row.get("emails", "").split(CSV_LIST_SEPARATOR) if value.strip()]
+        if not row.get("additional_data"):
+            row["additional_data"] = None
+        yield row_number, row
+
+
+def get_parser(content_type: str):
+    """function choose row parser by request content type"""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in ("text/csv", "application/csv"):
+        return parse_csv
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"):
+        return parse_ndjson
+    return None
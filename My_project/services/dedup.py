@@ -0,0 +1,65 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+class DuplicateFinder:
+    """Groups contacts that share a normalized phone number or email.
+
+    Child rows are fed one at a time; the first row seen with a key is
+    remembered in a hash index and every later contact with that key is
+    joined to its contact in a union-find forest, so one pass finds all
+    groups, including chains like A~B by phone and B~C by email. The root
+    of every group is its lowest contact ID. Later child IDs are kept only
+    for keys that repeat, so memory grows with the duplicates, not with
+    the address book.
+    """
+
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+        self.first: Dict[str, Dict[str, Tuple[int, int]]] = defaultdict(dict)
+        self.repeats: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+
+    def find(self, contact_id: int) -> int:
+        parent = self.parent
+        root = contact_id
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while contact_id != root:
+            parent[contact_id], contact_id = root, parent[contact_id]
+        return root
+
+    def union(self, first: int, second: int) -> None:
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+    def add(self, kind: str, key: Optional[str], contact_id: int, child_id: int) -> None:
+        """Index one phone number or email row by its normalized key"""
+        if key is None:
+            return
+        index = self.first[kind]
+        first = index.get(key)
+        if first is None:
+            index[key] = (contact_id, child_id)
+            return
+        self.repeats[kind, key].append(child_id)
+        if first[0] != contact_id:
+            self.union(first[0], contact_id)
+
+    def groups(self) -> Dict[int, List[int]]:
+        """Return {winner: sorted losers} for every group of more than one contact"""
+        groups = defaultdict(list)
+        for contact_id in list(self.parent):
+            root = self.find(contact_id)
+            if root != contact_id:
+                groups[root].append(contact_id)
+        return {winner: sorted(losers) for winner, losers in sorted(groups.items())}
+
+    def redundant_children(self, merged: set) -> Dict[str, List[int]]:
+        """Return IDs of child rows that repeat a key inside a merged group, keeping the lowest ID"""
+        redundant = {"phone": [], "email": []}
+        for (kind, key), child_ids in self.repeats.items():
+            contact_id, first_child = self.first[kind][key]
+            if self.find(contact_id) in merged:
+                redundant[kind].extend(sorted([first_child, *child_ids])[1:])
+        return redundant
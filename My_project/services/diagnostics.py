@@ -0,0 +1,158 @@
+import re
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from os import environ
+
+from sqlalchemy import event
+
+from My_project.services.metrics import current_request, route_template
+
+DB_DIAGNOSTICS_ENABLED = environ.get("DB_DIAGNOSTICS_ENABLED", "true").strip().lower() not in ("0", "false", "no", "off")
+DB_SLOW_QUERY_MS = float(environ.get("DB_SLOW_QUERY_MS", 200))
+DB_N_PLUS_ONE_THRESHOLD = int(environ.get("DB_N_PLUS_ONE_THRESHOLD", 10))
+DB_DIAGNOSTICS_HISTORY = int(environ.get("DB_DIAGNOSTICS_HISTORY", 100))
+
+_WHITESPACE = re.compile(r"\s+")
+_EXPANDED_LIST = re.compile(r"\((?:\s*(?:\?|%s|\$\d+|:\w+)\s*,)+\s*(?:\?|%s|\$\d+|:\w+)\s*\)")
+
+
+def statement_template(statement: str, context=None) -> str:
+    """function reduce a statement to a template, so expanded IN lists of any length compare equal"""
+    compiled = getattr(context, "compiled", None)
+    text = getattr(compiled, "string", None) or statement
+    return _EXPANDED_LIST.sub("(...)", _WHITESPACE.sub(" ", text).strip())
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    """function describe bound parameters by type only, never by value"""
+    if executemany and parameters:
+        return {"rows": len(parameters), "row": parameter_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class QueryRecord:
+    """One executed statement as seen by capture_queries"""
+    __slots__ = ("statement", "template", "parameters", "seconds", "route")
+
+    def __init__(self, statement: str, template: str, parameters, seconds: float, route: str):
+        self.statement = statement
+        self.template = template
+        self.parameters = parameters
+        self.seconds = seconds
+        self.route = route
+
+    def __repr__(self):
+        return f"<QueryRecord {self.seconds * 1000:.3f} ms {self.template[:80]!r}>"
+
+
+class QueryDiagnostics:
+    """Slow-query log and N+1 detector for SQLAlchemy engines.
+
+    Statements slower than slow_query_ms are logged with their parameter
+    shapes and the route of the current request. A request that runs the
+    same statement template more than n_plus_one_threshold times is
+    reported once per template. Both can be switched at runtime; recent
+    reports are kept for the internal diagnostics endpoint.
+    """
+
+    def __init__(self, enabled: bool, slow_query_ms: float, n_plus_one_threshold: int, history: int):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_queries = deque(maxlen=history)
+        self.n_plus_one = deque(maxlen=history)
+        self.captures = []
+
+    def configure(self, enabled: bool = None, slow_query_ms: float = None, n_plus_one_threshold: int = None) -> dict:
+        """Change settings at runtime and return the current ones"""
+        if enabled is not None:
+            self.enabled = enabled
+        if slow_query_ms is not None:
+            self.slow_query_ms = slow_query_ms
+        if n_plus_one_threshold is not None:
+            self.n_plus_one_threshold = n_plus_one_threshold
+        return self.settings()
+
+    def settings(self) -> dict:
+        return {"enabled": self.enabled, "slow_query_ms": self.slow_query_ms,
+                "n_plus_one_threshold": self.n_plus_one_threshold}
+
+    def report(self) -> dict:
+        """Return settings and the most recent findings"""
+        return {**self.settings(), "slow_queries": list(self.slow_queries), "n_plus_one": list(self.n_plus_one)}
+
+    def instrument_engine(self, engine) -> None:
+        """Watch every statement executed by an AsyncEngine"""
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("diagnostics_started", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["diagnostics_started"].pop()
+            if self.enabled or self.captures:
+                self.observe(statement, parameters, context, executemany, elapsed)
+
+    def observe(self, statement: str, parameters, context, executemany: bool, seconds: float) -> None:
+        request = current_request.get()
+        route = route_template(request.scope) if request is not None else None
+        template = statement_template(statement, context)
+
+        for capture in self.captures:
+            capture.append(QueryRecord(statement, template, parameter_shape(parameters, executemany), seconds, route))
+        if not self.enabled:
+            return
+
+        if seconds * 1000 >= self.slow_query_ms:
+            entry = {"route": route, "ms": round(seconds * 1000, 3), "statement": template,
+                     "parameters": parameter_shape(parameters, executemany)}
+            self.slow_queries.append(entry)
+            print(f"Slow query ---- {entry['ms']} ms {route or '-'} {template} {entry['parameters']}")
+
+        if request is not None:
+            if request.statements is None:
+                request.statements = Counter()
+            request.statements[template] += 1
+            if request.statements[template] == self.n_plus_one_threshold + 1:
+                entry = {"route": route, "method": request.method, "statement": template,
+                         "threshold": self.n_plus_one_threshold}
+                self.n_plus_one.append(entry)
+                print(f"N+1 query ---- {request.method} {route} ran more than "
+                      f"{self.n_plus_one_threshold} times: {template}")
+
+    @contextmanager
+    def capture_queries(self):
+        """Collect a QueryRecord for every statement executed inside the block"""
+        captured = []
+        self.captures.append(captured)
+        try:
+            yield captured
+        finally:
+            self.captures.remove(captured)
+
+    @contextmanager
+    def query_budget(self, max_queries: int, max_per_template: int = None):
+        """Fail with AssertionError when the block runs more statements than allowed"""
+        with self.capture_queries() as captured:
+            yield captured
+        problems = []
+        if len(captured) > max_queries:
+            problems.append(f"{len(captured)} queries, budget {max_queries}")
+        if max_per_template is not None:
+            for template, count in Counter(record.template for record in captured).items():
+                if count > max_per_template:
+                    problems.append(f"{count} x {template}")
+        if problems:
+            listing = "\n".join(f"  {record.template}" for record in captured)
+            raise AssertionError("Query budget exceeded: " + "; ".join(problems) + "\n" + listing)
+
+
+diagnostics = QueryDiagnostics(DB_DIAGNOSTICS_ENABLED, DB_SLOW_QUERY_MS, DB_N_PLUS_ONE_THRESHOLD,
+                               DB_DIAGNOSTICS_HISTORY)
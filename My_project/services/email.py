@@ -1,7 +1,13 @@
+import asyncio
+from email.message import EmailMessage
+from email.utils import formataddr
+from functools import lru_cache
 from pathlib import Path
 from os import environ
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pydantic import EmailStr
 
 from My_project.services.auth import create_email_token
@@ -21,17 +27,156 @@ conf = ConnectionConfig(
     TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
 )
 
+MAIL_WORKERS = int(environ.get("MAIL_WORKERS", 2))
+MAIL_QUEUE_SIZE = int(environ.get("MAIL_QUEUE_SIZE", 1000))
+MAIL_BATCH_SIZE = int(environ.get("MAIL_BATCH_SIZE", 20))
+MAIL_MAX_RETRIES = int(environ.get("MAIL_MAX_RETRIES", 3))
+MAIL_RETRY_BACKOFF = float(environ.get("MAIL_RETRY_BACKOFF", 1.0))
+
+
+@lru_cache
+def get_template(name: str):
+    """function load and compile an email template once"""
+    env = Environment(loader=FileSystemLoader(conf.TEMPLATE_FOLDER), autoescape=select_autoescape(["html"]))
+    return env.get_template(name)
+
+
+def build_message(recipient: str, subject: str, html: str) -> EmailMessage:
+    """function build an HTML email message"""
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = formataddr((conf.MAIL_FROM_NAME or "", conf.MAIL_FROM))
+    message["To"] = recipient
+    message.set_content(html, subtype="html")
+    return message
+
+
+class EmailWorker:
+    """Background delivery of emails over persistent SMTP connections.
+
+    Messages wait in a bounded queue. Each worker task keeps its own SMTP
+    connection open, sends up to batch_size queued messages over it in a row,
+    and reconnects after a failure. Failed messages are retried with
+    exponential backoff up to max_retries times; on stop, retries still
+    waiting for their backoff are queued again right away.
+    """
+
+    def __init__(self, config: ConnectionConfig, workers: int, queue_size: int, batch_size: int,
+                 max_retries: int, backoff: float):
+        self.config = config
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.queue = None
+        self.tasks = []
+        self.retries = {}
+        self.stats = {"sent": 0, "failed": 0, "retried": 0, "connections": 0}
+
+    async def start(self) -> None:
+        """Start the worker tasks"""
+        if self.queue is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Deliver queued messages and pending retries up to timeout, then stop the workers"""
+        if self.queue is None:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                await self._requeue_retries()
+                await asyncio.wait_for(self.queue.join(), max(deadline - loop.time(), 0))
+                if not self.retries:
+                    break
+        except asyncio.TimeoutError:
+            print(f"Send_email ---- {self.queue.qsize() + len(self.retries)} messages left unsent")
+        for task in [*self.tasks, *self.retries]:
+            task.cancel()
+        await asyncio.gather(*self.tasks, *self.retries, return_exceptions=True)
+        self.queue, self.tasks = None, []
+        self.retries.clear()
+
+    async def _requeue_retries(self) -> None:
+        """Queue messages waiting for a retry now instead of after their backoff"""
+        retries, self.retries = self.retries, {}
+        for task in retries:
+            task.cancel()
+        await asyncio.gather(*retries, return_exceptions=True)
+        for task, (message, attempt) in retries.items():
+            # a retry that finished has queued its message already
+            if task.cancelled():
+                await self.queue.put((message, attempt))
+
+    async def enqueue(self, message: EmailMessage, attempt: int = 0) -> None:
+        """Queue a message, waiting while the queue is full"""
+        if self.queue is None:
+            await self.start()
+        await self.queue.put((message, attempt))
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        config = self.config
+        smtp = aiosmtplib.SMTP(hostname=config.MAIL_SERVER, port=config.MAIL_PORT, use_tls=config.MAIL_SSL_TLS,
+                               start_tls=config.MAIL_STARTTLS, validate_certs=config.VALIDATE_CERTS)
+        await smtp.connect()
+        if config.USE_CREDENTIALS:
+            await smtp.login(config.MAIL_USERNAME, config.MAIL_PASSWORD.get_secret_value())
+        self.stats["connections"] += 1
+        return smtp
+
+    async def _retry_later(self, message: EmailMessage, attempt: int) -> None:
+        await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+        await self.enqueue(message, attempt)
+
+    async def _run(self) -> None:
+        smtp = None
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                while len(batch) < self.batch_size and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+
+                for message, attempt in batch:
+                    try:
+                        if smtp is None or not smtp.is_connected:
+                            smtp = await self._connect()
+                        await smtp.send_message(message)
+                        self.stats["sent"] += 1
+                    except (aiosmtplib.SMTPException, OSError) as e:
+                        if smtp is not None and smtp.is_connected:
+                            smtp.close()
+                        smtp = None
+                        if attempt < self.max_retries:
+                            self.stats["retried"] += 1
+                            retry = asyncio.create_task(self._retry_later(message, attempt + 1))
+                            self.retries[retry] = (message, attempt + 1)
+                            retry.add_done_callback(lambda task: self.retries.pop(task, None))
+                        else:
+                            self.stats["failed"] += 1
+                            print(f" Send_email ---- {e}")
+                    except Exception as e:
+                        # not a delivery problem, so retrying will not help; the worker must survive it
+                        if smtp is not None and smtp.is_connected:
+                            smtp.close()
+                        smtp = None
+                        self.stats["failed"] += 1
+                        print(f" Send_email ---- {e.__class__.__name__}: {e}")
+                    finally:
+                        self.queue.task_done()
+        finally:
+            if smtp is not None and smtp.is_connected:
+                smtp.close()
+
+
+email_worker = EmailWorker(conf, MAIL_WORKERS, MAIL_QUEUE_SIZE, MAIL_BATCH_SIZE, MAIL_MAX_RETRIES, MAIL_RETRY_BACKOFF)
+
+
 async def send_email(email: EmailStr, username: str, host: str):
     """function send email"""
-    try:
-        token_verification = await create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-        fm = FastMail(conf)
-        await fm.send_message(message,template_name="email_template.html")
-    except ConnectionErrors as e:
-        print(f" Send_email ---- {e}")
\ No newline at end of file
+    token_verification = await create_email_token({"sub": email})
+    html = get_template("email_template.html").render(host=host, username=username, token=token_verification)
+    await email_worker.enqueue(build_message(email, "Confirm your email", html))
@@ -0,0 +1,11 @@
+import hashlib
+from functools import lru_cache
+
+GRAVATAR_URL = "https://www.gravatar.com/avatar/"
+
+
+@lru_cache(maxsize=10000)
+def gravatar_url(email: str) -> str:
+    """function build the Gravatar URL for an email: MD5 of the trimmed, lowercased address"""
+    digest = hashlib.md5(email.strip().lower().encode("utf-8")).hexdigest()
+    return f"{GRAVATAR_URL}{digest}"
@@ -0,0 +1,28 @@
+import hmac
+from os import environ
+from typing import Optional
+
+from fastapi import Header, HTTPException
+from starlette import status
+
+INTERNAL_API_TOKEN = environ.get("INTERNAL_API_TOKEN")
+
+
+async def require_internal_token(x_internal_token: Optional[str] = Header(None),
+                                 authorization: Optional[str] = Header(None)) -> None:
+    """function allow operational endpoints only to callers presenting INTERNAL_API_TOKEN.
+
+    The token is read from X-Internal-Token or an Authorization: Bearer header,
+    so scrapers that only support bearer credentials work too. Without a
+    configured token the endpoints are closed to everyone.
+    """
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Internal endpoints are disabled")
+    token = x_internal_token
+    if token is None and authorization:
+        scheme, _, credentials = authorization.partition(" ")
+        if scheme.lower() == "bearer":
+            token = credentials
+    if not token or not hmac.compare_digest(token.encode(), INTERNAL_API_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid internal token",
+                            headers={"WWW-Authenticate": "Bearer"})
@@ -0,0 +1,290 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestContext:
+    """Per-request counters, reachable from SQLAlchemy events through a context variable"""
+    __slots__ = ("scope", "method", "route", "queries", "db_seconds", "statements", "redis_commands", "redis_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.route = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = None
+        self.redis_commands = 0
+        self.redis_seconds = 0.0
+
+
+current_request: ContextVar[Optional[RequestContext]] = ContextVar("current_request", default=None)
+
+_route_templates = {}
+
+
+def route_template(scope) -> str:
+    """Return the full path template of the route matched for the scope, or unmatched"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if not path:
+        return "unmatched"
+    template = _route_templates.get(id(route))
+    if template is None:
+        # routers included with a prefix may expose only their own part of the path
+        template = path
+        request_path = scope["path"]
+        path_regex = getattr(route, "path_regex", None)
+        if path_regex is not None and not path_regex.match(request_path):
+            for index, char in enumerate(request_path):
+                if char == "/" and path_regex.match(request_path[index:]):
+                    template = request_path[:index] + path
+                    break
+        _route_templates[id(route)] = template
+    return template
+
+
+class Histogram:
+    """Fixed-bucket histogram; bucket counts are kept per bucket and summed on render"""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class Metrics:
+    """In-process request and database metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.latency = {}
+        self.db_queries = {}
+        self.db_seconds = {}
+        self.responses = {}
+        self.queries_outside_requests = 0
+        self.db_seconds_outside_requests = 0.0
+        self.redis_commands = {}
+        self.redis_seconds = {}
+        self.redis_commands_outside_requests = 0
+        self.redis_seconds_outside_requests = 0.0
+        self.collectors = []
+
+    def observe(self, context: RequestContext, status_code: int, seconds: float) -> None:
+        key = (context.method, context.route)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.db_queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+            self.db_seconds[key] = 0.0
+            self.redis_commands[key] = Histogram(QUERY_COUNT_BUCKETS)
+            self.redis_seconds[key] = 0.0
+        histogram.observe(seconds)
+        self.db_queries[key].observe(context.queries)
+        self.db_seconds[key] += context.db_seconds
+        self.redis_commands[key].observe(context.redis_commands)
+        self.redis_seconds[key] += context.redis_seconds
+        status_key = (context.method, context.route, status_code)
+        self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def add_collector(self, name: str, help_text: str, collect) -> None:
+        """Register a callable returning a stats dict, rendered as a gauge labelled by stat name"""
+        self.collectors.append((name, help_text, collect))
+
+    def instrument_engine(self, engine) -> None:
+        """Count queries and database time of an AsyncEngine per request"""
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+            request = current_request.get()
+            if request is None:
+                self.queries_outside_requests += 1
+                self.db_seconds_outside_requests += elapsed
+            else:
+                request.queries += 1
+                request.db_seconds += elapsed
+
+    def _observe_redis(self, commands: int, seconds: float) -> None:
+        request = current_request.get()
+        if request is None:
+            self.redis_commands_outside_requests += commands
+            self.redis_seconds_outside_requests += seconds
+        else:
+            request.redis_commands += commands
+            request.redis_seconds += seconds
+
+    def instrument_redis(self, client) -> None:
+        """Count commands and time of a redis.asyncio client per request.
+
+        Commands and script calls go through execute_command; a pipeline is
+        timed as one round trip and counts every command it carries.
+        """
+        execute_command = client.execute_command
+        pipeline = client.pipeline
+
+        async def counted_execute_command(*args, **options):
+            started = time.perf_counter()
+            try:
+                return await execute_command(*args, **options)
+            finally:
+                self._observe_redis(1, time.perf_counter() - started)
+
+        def counted_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            async def counted_execute(*execute_args, **execute_kwargs):
+                commands = len(pipe.command_stack)
+                started = time.perf_counter()
+                try:
+                    return await execute(*execute_args, **execute_kwargs)
+                finally:
+                    self._observe_redis(commands, time.perf_counter() - started)
+
+            pipe.execute = counted_execute
+            return pipe
+
+        client.execute_command = counted_execute_command
+        client.pipeline = counted_pipeline
+
+    @staticmethod
+    def _histogram_lines(name: str, histograms: dict) -> list:
+        lines = []
+        for (method, route), histogram in sorted(histograms.items(), key=lambda item: (item[0][1], item[0][0])):
+            labels = _labels(method=method, route=route)
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return lines
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_request_duration_seconds Request latency by route template",
+            "# TYPE http_request_duration_seconds histogram",
+            *self._histogram_lines("http_request_duration_seconds", self.latency),
+            "# HELP http_responses_total Responses by route template and status code",
+            "# TYPE http_responses_total counter",
+        ]
+        for (method, route, status_code), count in sorted(self.responses.items(),
+                                                          key=lambda item: (item[0][1], item[0][0], item[0][2])):
+            lines.append(f"http_responses_total{{{_labels(method=method, route=route, status=status_code)}}} {count}")
+        lines += [
+            "# HELP http_request_db_queries Database queries issued per request",
+            "# TYPE http_request_db_queries histogram",
+            *self._histogram_lines("http_request_db_queries", self.db_queries),
+            "# HELP http_request_db_seconds_total Database time spent by requests",
+            "# TYPE http_request_db_seconds_total counter",
+        ]
+        for (method, route), seconds in sorted(self.db_seconds.items(), key=lambda item: (item[0][1], item[0][0])):
+            lines.append(f"http_request_db_seconds_total{{{_labels(method=method, route=route)}}} {seconds}")
+        lines += [
+            "# HELP http_request_redis_commands Redis commands issued per request",
+            "# TYPE http_request_redis_commands histogram",
+            *self._histogram_lines("http_request_redis_commands", self.redis_commands),
+            "# HELP http_request_redis_seconds_total Redis time spent by requests",
+            "# TYPE http_request_redis_seconds_total counter",
+        ]
+        for (method, route), seconds in sorted(self.redis_seconds.items(), key=lambda item: (item[0][1], item[0][0])):
+            lines.append(f"http_request_redis_seconds_total{{{_labels(method=method, route=route)}}} {seconds}")
+        lines += [
+            "# HELP db_queries_outside_requests_total Queries issued outside HTTP requests",
+            "# TYPE db_queries_outside_requests_total counter",
+            f"db_queries_outside_requests_total {self.queries_outside_requests}",
+            "# HELP db_seconds_outside_requests_total Database time spent outside HTTP requests",
+            "# TYPE db_seconds_outside_requests_total counter",
+            f"db_seconds_outside_requests_total {self.db_seconds_outside_requests}",
+            "# HELP redis_commands_outside_requests_total Redis commands issued outside HTTP requests",
+            "# TYPE redis_commands_outside_requests_total counter",
+            f"redis_commands_outside_requests_total {self.redis_commands_outside_requests}",
+            "# HELP redis_seconds_outside_requests_total Redis time spent outside HTTP requests",
+            "# TYPE redis_seconds_outside_requests_total counter",
+            f"redis_seconds_outside_requests_total {self.redis_seconds_outside_requests}",
+        ]
+        for name, help_text, collect in self.collectors:
+            try:
+                stats = collect()
+            except Exception as e:
+                print(f"Metrics ---- {name}: {e}")
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for stat, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"{name}{{{_labels(stat=stat)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request by its route template.
+
+    The route template is read from scope["route"] after routing, so
+    /api/contact/1 and /api/contact/2 share one series; unmatched requests
+    are recorded under "unmatched".
+    """
+
+    def __init__(self, app, registry: Metrics = metrics):
+        self.app = app
+        self.metrics = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = RequestContext(scope)
+        token = current_request.set(context)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.in_flight -= 1
+            context.route = route_template(scope)
+            self.metrics.observe(context, status_code, elapsed)
+            current_request.reset(token)
@@ -0,0 +1,16 @@
+from typing import Optional
+
+
+def normalize_phone(phone_number: Optional[str]) -> Optional[str]:
+    """function reduce a phone number to its digits, so "+38 (050) 123-45-67" and "380501234567" match"""
+    if not phone_number:
+        return None
+    digits = "".join(char for char in phone_number if char.isdigit())
+    return digits or None
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """function compare emails without case or surrounding whitespace"""
+    if not email:
+        return None
+    return email.strip().lower() or None
@@ -0,0 +1,86 @@
+import math
+import time
+from os import environ
+
+from fastapi import HTTPException, Request, Response
+from starlette import status
+
+RATE_LIMIT_ENABLED = environ.get("RATE_LIMIT_ENABLED", "true").strip().lower() not in ("0", "false", "no", "off")
+RATE_LIMIT_LEASE_FRACTION = float(environ.get("RATE_LIMIT_LEASE_FRACTION", 0.2))
+RATE_LIMIT_MAX_BUCKETS = int(environ.get("RATE_LIMIT_MAX_BUCKETS", 100000))
+
+# Grant up to ARGV[2] requests of the ARGV[1] allowed in the current window of ARGV[3] ms.
+# Returns {granted, milliseconds left in the window}.
+LEASE_SCRIPT = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local grant = math.min(tonumber(ARGV[2]), tonumber(ARGV[1]) - used)
+if grant <= 0 then
+    return {0, redis.call('PTTL', KEYS[1])}
+end
+if redis.call('INCRBY', KEYS[1], grant) == grant then
+    redis.call('PEXPIRE', KEYS[1], ARGV[3])
+end
+return {grant, redis.call('PTTL', KEYS[1])}
+"""
+
+
+class RateLimiter:
+    """Rate limiting dependency with the same declaration as fastapi_limiter's RateLimiter.
+
+    Every worker keeps local token buckets and leases quota from Redis in
+    blocks of RATE_LIMIT_LEASE_FRACTION of the limit, one Lua call per lease.
+    A lease never outlives the Redis window and unused tokens are not
+    returned, so the global limit is approximate but never exceeded.
+    """
+    enabled = RATE_LIMIT_ENABLED
+    redis = None
+    lease_script = None
+
+    def __init__(self, times: int = 1, milliseconds: int = 0, seconds: int = 0, minutes: int = 0, hours: int = 0):
+        self.times = times
+        self.milliseconds = milliseconds + 1000 * seconds + 60000 * minutes + 3600000 * hours
+        self.block = max(1, int(times * RATE_LIMIT_LEASE_FRACTION))
+        self.buckets = {}
+
+    @classmethod
+    async def init(cls, redis_client) -> None:
+        """Attach the Redis client and register the lease script"""
+        cls.redis = redis_client
+        cls.lease_script = redis_client.register_script(LEASE_SCRIPT)
+
+    @staticmethod
+    def identifier(request: Request) -> str:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+        return request.client.host if request.client else "unknown"
+
+    def _prune(self, now: float) -> None:
+        for key in [key for key, bucket in self.buckets.items() if bucket[1] <= now]:
+            del self.buckets[key]
+
+    async def __call__(self, request: Request, response: Response):
+        if not self.enabled:
+            return
+        route = request.scope.get("route")
+        path = getattr(route, "path", request.scope["path"])
+        key = f"ratelimit:{self.identifier(request)}:{request.method}:{path}"
+
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is not None and bucket[1] > now and bucket[0] > 0:
+            bucket[0] -= 1
+            return
+
+        granted, pttl = await self.lease_script(keys=[key], args=[self.times, self.block, self.milliseconds])
+        pttl = int(pttl) if int(pttl) > 0 else self.milliseconds
+        if int(granted) <= 0:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(math.ceil(pttl / 1000))})
+
+        if len(self.buckets) >= RATE_LIMIT_MAX_BUCKETS:
+            self._prune(now)
+        bucket = self.buckets.get(key)
+        # a concurrent lease for the same key may already have refilled the bucket
+        tokens = bucket[0] if bucket is not None and bucket[1] > now else 0
+        self.buckets[key] = [tokens + int(granted) - 1, now + pttl / 1000]
@@ -0,0 +1,132 @@
+import time
+import uuid
+from os import environ
+from typing import Tuple
+
+from fastapi import HTTPException
+from jose import JWTError
+from redis.exceptions import RedisError
+from starlette import status
+
+from My_project.services.auth import create_refresh_token, token_cache
+
+REFRESH_TOKEN_SECONDS = int(environ.get("REFRESH_TOKEN_SECONDS", 7 * 24 * 3600))
+
+# KEYS[1] family key; ARGV[1] presented jti, ARGV[2] next jti, ARGV[3] TTL in ms.
+# Returns 1 when rotated, 0 for an unknown or revoked family, -1 on reuse (the family is deleted).
+ROTATE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return 0
+end
+if current ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return -1
+end
+redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+return 1
+"""
+
+
+class RefreshTokenStore:
+    """Refresh tokens as rotation families in Redis.
+
+    Login starts a family: rt:fam:{fid} holds the jti of the only refresh
+    token of that family that may still be used, with a TTL equal to the
+    token lifetime. Each refresh swaps the jti with one compare-and-set
+    script call. Presenting an already rotated token is treated as theft
+    and revokes the whole family. Before init, families live in process
+    memory.
+    """
+
+    def __init__(self, lifetime: int):
+        self.lifetime = lifetime
+        self.redis = None
+        self.rotate_script = None
+        self.families = {}
+
+    async def init(self, redis_client) -> None:
+        """Attach the Redis client and register the rotation script"""
+        self.redis = redis_client
+        self.rotate_script = redis_client.register_script(ROTATE_SCRIPT)
+
+    @staticmethod
+    def _key(family_id: str) -> str:
+        return f"rt:fam:{family_id}"
+
+    async def _new_token(self, email: str, family_id: str) -> Tuple[str, str]:
+        jti = uuid.uuid4().hex
+        token = await create_refresh_token(data={"sub": email, "fid": family_id, "jti": jti},
+                                           expires_delta=self.lifetime)
+        return jti, token
+
+    async def issue(self, email: str) -> str:
+        """Start a new family and return its first refresh token"""
+        family_id = uuid.uuid4().hex
+        jti, token = await self._new_token(email, family_id)
+        if self.redis is None:
+            now = time.monotonic()
+            self.families = {key: family for key, family in self.families.items() if family[1] > now}
+            self.families[family_id] = (jti, now + self.lifetime)
+            return token
+        try:
+            await self.redis.set(self._key(family_id), jti, ex=self.lifetime)
+        except RedisError as e:
+            print(f"Refresh token ---- {e}")
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token store unavailable")
+        return token
+
+    @staticmethod
+    def _claims(token: str) -> dict:
+        exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        try:
+            payload = token_cache.decode(token)
+        except JWTError:
+            raise exception
+        if payload.get("scope") != "refresh_token" or not all(payload.get(claim) for claim in ("sub", "fid", "jti")):
+            raise exception
+        return payload
+
+    def _rotate_local(self, family_id: str, jti: str, next_jti: str) -> int:
+        current = self.families.get(family_id)
+        if current is None or current[1] <= time.monotonic():
+            self.families.pop(family_id, None)
+            return 0
+        if current[0] != jti:
+            del self.families[family_id]
+            return -1
+        self.families[family_id] = (next_jti, time.monotonic() + self.lifetime)
+        return 1
+
+    async def rotate(self, token: str) -> Tuple[str, str]:
+        """Exchange a refresh token for the next one of its family, returning (email, new token)"""
+        payload = self._claims(token)
+        email, family_id = payload["sub"], payload["fid"]
+        next_jti, next_token = await self._new_token(email, family_id)
+        if self.redis is None:
+            result = self._rotate_local(family_id, payload["jti"], next_jti)
+        else:
+            try:
+                result = await self.rotate_script(keys=[self._key(family_id)],
+                                                  args=[payload["jti"], next_jti, self.lifetime * 1000])
+            except RedisError as e:
+                print(f"Refresh token ---- {e}")
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token store unavailable")
+        if int(result) != 1:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        return email, next_token
+
+    async def revoke(self, token: str) -> None:
+        """Revoke the whole family of a refresh token"""
+        family_id = self._claims(token)["fid"]
+        if self.redis is None:
+            self.families.pop(family_id, None)
+            return
+        try:
+            await self.redis.delete(self._key(family_id))
+        except RedisError as e:
+            print(f"Refresh token ---- {e}")
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token store unavailable")
+
+
+refresh_tokens = RefreshTokenStore(REFRESH_TOKEN_SECONDS)
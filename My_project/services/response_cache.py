@@ -0,0 +1,81 @@
+import hashlib
+import json
+from os import environ
+from typing import Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from redis.exceptions import RedisError
+
+RESPONSE_CACHE_TTL = int(environ.get("RESPONSE_CACHE_TTL", 300))
+
+
+class ResponseCache:
+    """Redis cache of rendered contact responses with strong ETags.
+
+    Cache keys embed a per-user version counter, so bumping the counter after
+    a write makes every cached response of that user unreachable at once.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.redis = None
+
+    async def init(self, redis_client) -> None:
+        """Attach the Redis client"""
+        self.redis = redis_client
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"contacts:version:{user_id}"
+
+    async def get(self, user_id: int, route: str, request: Request) -> Tuple[Optional[str], Optional[dict]]:
+        """Return the cache key for the request and the cached entry, if any"""
+        if self.redis is None:
+            return None, None
+        params = urlencode(sorted(request.query_params.multi_items()))
+        try:
+            version = await self.redis.get(self._version_key(user_id)) or "0"
+            key = f"contacts:response:{user_id}:{version}:{route}?{params}"
+            raw = await self.redis.get(key)
+        except RedisError as e:
+            print(f"Response cache ---- {e}")
+            return None, None
+        return key, json.loads(raw) if raw else None
+
+    async def set(self, key: Optional[str], body: str, headers: Optional[dict] = None) -> dict:
+        """Store a rendered response body and return the entry with its ETag"""
+        entry = {
+            "etag": '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"',
+            "body": body,
+            "headers": headers or {}
+        }
+        if self.redis is not None and key is not None:
+            try:
+                await self.redis.set(key, json.dumps(entry), ex=self.ttl)
+            except RedisError as e:
+                print(f"Response cache ---- {e}")
+        return entry
+
+    async def bump(self, user_id: int) -> None:
+        """Invalidate all cached responses of the user"""
+        if self.redis is None:
+            return
+        try:
+            await self.redis.incr(self._version_key(user_id))
+        except RedisError as e:
+            print(f"Response cache ---- {e}")
+
+    @staticmethod
+    def respond(request: Request, entry: dict) -> Response:
+        """Build the response for a cache entry, answering If-None-Match with 304"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            if "*" in tags or entry["etag"] in tags:
+                return Response(status_code=304, headers={"ETag": entry["etag"]})
+        return Response(content=entry["body"], media_type="application/json",
+                        headers={"ETag": entry["etag"], **entry["headers"]})
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_TTL)
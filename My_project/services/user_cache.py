@@ -0,0 +1,132 @@
+import json
+import time
+from collections import OrderedDict
+from os import environ
+from typing import Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from My_project.database.models import User
+
+USER_CACHE_SIZE = int(environ.get("USER_CACHE_SIZE", 10000))
+USER_CACHE_LOCAL_TTL = float(environ.get("USER_CACHE_LOCAL_TTL", 30))
+USER_CACHE_REDIS_TTL = int(environ.get("USER_CACHE_REDIS_TTL", 900))
+
+# password and refresh_token never leave the database
+CACHED_FIELDS = ("id", "username", "email", "avatar", "confirmed")
+
+# KEYS[1] user key, KEYS[2] generation key; ARGV[1] user JSON, ARGV[2] TTL in seconds,
+# ARGV[3] generation seen before the database read. Returns 1 when stored, 0 when invalidated meanwhile.
+SET_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[3] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+
+class UserCache:
+    """Two-tier cache of authenticated users keyed by token subject (email).
+
+    The first tier is a bounded in-process LRU with a short TTL, the second one
+    is Redis shared by all workers. Invalidation clears both tiers; other
+    workers may serve their local copy until its TTL runs out.
+
+    Invalidation also bumps a per-user generation. A reader takes the
+    generation before it reads the user from the database and set stores
+    the row only if the generation is still the same, so a read that raced
+    with a write cannot put the old row back after its invalidation.
+    """
+
+    def __init__(self, maxsize: int, local_ttl: float, redis_ttl: int):
+        self.maxsize = maxsize
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.redis = None
+        self.set_script = None
+        self._entries: OrderedDict = OrderedDict()
+        self._invalidations = 0
+
+    async def init(self, redis_client) -> None:
+        """Attach the Redis client used as the second tier"""
+        self.redis = redis_client
+        self.set_script = redis_client.register_script(SET_SCRIPT)
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return f"user:{email}"
+
+    @staticmethod
+    def _generation_key(email: str) -> str:
+        return f"user:gen:{email}"
+
+    def _store_local(self, email: str, data: dict) -> None:
+        self._entries[email] = (time.monotonic() + self.local_ttl, data)
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, email: str) -> Optional[User]:
+        """Return a detached copy of the cached user or None"""
+        entry = self._entries.get(email)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(email)
+                return User(**entry[1])
+            del self._entries[email]
+
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self._key(email))
+        except RedisError as e:
+            print(f"User cache ---- {e}")
+            return None
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        self._store_local(email, data)
+        return User(**data)
+
+    async def generation(self, email: str) -> Tuple[int, Optional[str]]:
+        """Return the generation to pass to set, taken before reading the user from the database"""
+        if self.redis is None:
+            return self._invalidations, "0"
+        try:
+            return self._invalidations, await self.redis.get(self._generation_key(email)) or "0"
+        except RedisError as e:
+            print(f"User cache ---- {e}")
+            return self._invalidations, None
+
+    async def set(self, user: User, generation: Tuple[int, Optional[str]]) -> None:
+        """Put the user into both tiers, unless it was invalidated since generation was taken"""
+        data = {field: getattr(user, field) for field in CACHED_FIELDS}
+        local_generation, redis_generation = generation
+        # any invalidation in this process skips the local tier; a miss is cheaper than a stale user
+        if local_generation == self._invalidations:
+            self._store_local(user.email, data)
+        if self.redis is not None and redis_generation is not None:
+            try:
+                await self.set_script(keys=[self._key(user.email), self._generation_key(user.email)],
+                                      args=[json.dumps(data), self.redis_ttl, redis_generation])
+            except RedisError as e:
+                print(f"User cache ---- {e}")
+
+    async def invalidate(self, email: str) -> None:
+        """Drop the user from both tiers and start a new generation"""
+        self._invalidations += 1
+        self._entries.pop(email, None)
+        if self.redis is not None:
+            try:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    # the generation outlives any read that could still be in flight
+                    await (pipe.incr(self._generation_key(email))
+                           .expire(self._generation_key(email), self.redis_ttl)
+                           .delete(self._key(email))
+                           .execute())
+            except RedisError as e:
+                print(f"User cache ---- {e}")
+
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_LOCAL_TTL, USER_CACHE_REDIS_TTL)
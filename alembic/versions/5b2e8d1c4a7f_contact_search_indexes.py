@@ -0,0 +1,41 @@
+"""Contact search indexes
+
+Revision ID: 5b2e8d1c4a7f
+Revises: 07cb83fa823f
+Create Date: 2026-10-18 09:12:40.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8d1c4a7f'
+down_revision: Union[str, None] = '07cb83fa823f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXES = [
+    ('ix_contacts_first_name_trgm', 'contacts', 'first_name'),
+    ('ix_contacts_last_name_trgm', 'contacts', 'last_name'),
+    ('ix_emails_email_trgm', 'emails', 'email'),
+    ('ix_phone_numbers_phone_number_trgm', 'phone_numbers', 'phone_number'),
+]
+
+
+def upgrade() -> None:
+    # trigram indexes exist only on PostgreSQL; other backends fall back to plain LIKE scans
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expression in TRIGRAM_INDEXES:
+        op.create_index(name, table, [sa.text(f'{expression} gin_trgm_ops')], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, _ in TRIGRAM_INDEXES:
+        op.drop_index(name, table_name=table)
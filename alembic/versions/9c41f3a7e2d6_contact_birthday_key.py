@@ -0,0 +1,35 @@
+"""Contact birthday key
+
+Revision ID: 9c41f3a7e2d6
+Revises: 5b2e8d1c4a7f
+Create Date: 2026-10-18 10:03:17.482915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c41f3a7e2d6'
+down_revision: Union[str, None] = '5b2e8d1c4a7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_key', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('UPDATE contacts SET birthday_key = '
+                   'EXTRACT(MONTH FROM date_of_birthday) * 100 + EXTRACT(DAY FROM date_of_birthday) '
+                   'WHERE date_of_birthday IS NOT NULL')
+    else:
+        op.execute("UPDATE contacts SET birthday_key = CAST(strftime('%m%d', date_of_birthday) AS INTEGER) "
+                   "WHERE date_of_birthday IS NOT NULL")
+    op.create_index('ix_contacts_user_id_birthday_key', 'contacts', ['user_id', 'birthday_key'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_key', table_name='contacts')
+    op.drop_column('contacts', 'birthday_key')
@@ -0,0 +1,62 @@
+"""Contact lookup indexes
+
+Revision ID: a83f5c2d9b10
+Revises: d47a0e6b18c3
+Create Date: 2026-10-18 15:12:44.906137
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from My_project.services.normalize import normalize_email, normalize_phone
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a83f5c2d9b10'
+down_revision: Union[str, None] = 'd47a0e6b18c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill(table_name: str, column: str, normalized_column: str, normalize) -> None:
+    """Fill the normalized column in keyset batches with the same helper the models use"""
+    connection = op.get_bind()
+    table = sa.table(table_name, sa.column('id', sa.Integer), sa.column(column, sa.String),
+                     sa.column(normalized_column, sa.String))
+    update = (table.update().where(table.c.id == sa.bindparam('row_id'))
+              .values({normalized_column: sa.bindparam('normalized')}))
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.select(table.c.id, table.c[column])
+                                  .where(table.c.id > last_id, table.c[column].is_not(None))
+                                  .order_by(table.c.id).limit(BACKFILL_BATCH_SIZE)).all()
+        if not rows:
+            break
+        connection.execute(update, [{'row_id': row_id, 'normalized': normalize(value)} for row_id, value in rows])
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    # contacts.user_id is already the leading column of ix_contacts_user_id_birthday_key
+    op.create_index('ix_phone_numbers_contact_id', 'phone_numbers', ['contact_id'], unique=False)
+    op.create_index('ix_emails_contact_id', 'emails', ['contact_id'], unique=False)
+
+    op.add_column('phone_numbers', sa.Column('phone_normalized', sa.String(length=15), nullable=True))
+    op.add_column('emails', sa.Column('email_normalized', sa.String(length=128), nullable=True))
+    backfill('phone_numbers', 'phone_number', 'phone_normalized', normalize_phone)
+    backfill('emails', 'email', 'email_normalized', normalize_email)
+    op.create_index('ix_phone_numbers_phone_normalized', 'phone_numbers', ['phone_normalized'], unique=False)
+    op.create_index('ix_emails_email_normalized', 'emails', ['email_normalized'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_emails_email_normalized', table_name='emails')
+    op.drop_index('ix_phone_numbers_phone_normalized', table_name='phone_numbers')
+    op.drop_column('emails', 'email_normalized')
+    op.drop_column('phone_numbers', 'phone_normalized')
+    op.drop_index('ix_emails_contact_id', table_name='emails')
+    op.drop_index('ix_phone_numbers_contact_id', table_name='phone_numbers')
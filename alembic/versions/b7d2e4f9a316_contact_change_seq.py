@@ -0,0 +1,33 @@
+"""Contact change sequence
+
+Revision ID: b7d2e4f9a316
+Revises: e5c9a1f07b42
+Create Date: 2026-10-18 19:42:11.604218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e4f9a316'
+down_revision: Union[str, None] = 'e5c9a1f07b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing rows start at 0; sync tokens issued before this revision are rejected, so clients resync
+    op.add_column('users', sa.Column('contact_change_seq', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('contacts', sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+    op.drop_index('ix_contacts_user_id_updated_at', table_name='contacts')
+    op.create_index('ix_contacts_user_id_change_seq', 'contacts', ['user_id', 'change_seq', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_change_seq', table_name='contacts')
+    op.create_index('ix_contacts_user_id_updated_at', 'contacts', ['user_id', 'updated_at', 'id'], unique=False)
+    op.drop_column('contacts', 'change_seq')
+    op.drop_column('users', 'contact_change_seq')
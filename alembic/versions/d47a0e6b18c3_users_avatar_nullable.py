@@ -0,0 +1,27 @@
+"""Users avatar nullable
+
+Revision ID: d47a0e6b18c3
+Revises: 9c41f3a7e2d6
+Create Date: 2026-10-18 13:41:09.275604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd47a0e6b18c3'
+down_revision: Union[str, None] = '9c41f3a7e2d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('users', 'avatar', existing_type=sa.String(length=255), nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("UPDATE users SET avatar = '' WHERE avatar IS NULL")
+    op.alter_column('users', 'avatar', existing_type=sa.String(length=255), nullable=False)
@@ -0,0 +1,35 @@
+"""Contact changes feed
+
+Revision ID: e5c9a1f07b42
+Revises: a83f5c2d9b10
+Create Date: 2026-10-18 16:27:05.318442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c9a1f07b42'
+down_revision: Union[str, None] = 'a83f5c2d9b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('contacts', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute('UPDATE contacts SET updated_at = CURRENT_TIMESTAMP')
+    op.create_index('ix_contacts_user_id_updated_at', 'contacts', ['user_id', 'updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_updated_at', table_name='contacts')
+    # contacts deleted while the feed existed are removed for good, with their children
+    op.execute('DELETE FROM phone_numbers WHERE contact_id IN (SELECT id FROM contacts WHERE deleted_at IS NOT NULL)')
+    op.execute('DELETE FROM emails WHERE contact_id IN (SELECT id FROM contacts WHERE deleted_at IS NOT NULL)')
+    op.execute('DELETE FROM contacts WHERE deleted_at IS NOT NULL')
+    op.drop_column('contacts', 'deleted_at')
+    op.drop_column('contacts', 'updated_at')
@@ -0,0 +1,62 @@
+"""Serialization cost of a ContactResponse page: FastAPI's default path against the fast path.
+
+Usage: python -m benchmarks.contact_serialization [contacts] [rounds]
+"""
+import json
+import os
+import sys
+import timeit
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL_ASYNC", "sqlite+aiosqlite:///:memory:")
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from My_project.database.models import Contact, Email, PhoneNumber
+from My_project.schemas import ContactListAdapter, ContactResponse
+
+
+def build_contacts(count: int) -> list:
+    return [Contact(id=i, first_name=f"First{i}", last_name=f"Last{i}", date_of_birthday=date(1990, 1 + i % 12, 1 + i % 28),
+                    additional_data="note" if i % 2 else None,
+                    phone_numbers=[PhoneNumber(id=i * 2 + n, phone_number=f"+38050{i:07d}") for n in range(2)],
+                    emails=[Email(id=i * 2 + n, email=f"contact{i}.{n}@example.com") for n in range(2)])
+            for i in range(count)]
+
+
+def build_rows(contacts: list) -> list:
+    """Dicts shaped like the Core rows returned by repository.contact.get_contacts"""
+    return [{"id": c.id, "first_name": c.first_name, "last_name": c.last_name, "date_of_birthday": c.date_of_birthday,
+             "additional_data": c.additional_data,
+             "phone_numbers": [{"phone_number": p.phone_number, "id": p.id} for p in c.phone_numbers],
+             "emails": [{"email": e.email, "id": e.id} for e in c.emails]}
+            for c in contacts]
+
+
+def main(count: int, rounds: int):
+    contacts = build_contacts(count)
+    rows = build_rows(contacts)
+
+    paths = {
+        # response_model validation, jsonable_encoder and json.dumps, as FastAPI did for ORM results
+        "orm_default": lambda: json.dumps(jsonable_encoder([ContactResponse.model_validate(c) for c in contacts]),
+                                          separators=(",", ":")),
+        "orm_type_adapter": lambda: ContactListAdapter.dump_json(
+            ContactListAdapter.validate_python(contacts, from_attributes=True)),
+        "core_rows_orjson": lambda: orjson.dumps(rows),
+    }
+    assert json.loads(paths["orm_default"]()) == json.loads(paths["core_rows_orjson"]())
+
+    results = []
+    for name, path in paths.items():
+        seconds = min(timeit.repeat(path, number=rounds, repeat=5)) / rounds
+        results.append({"path": name, "contacts": count, "us_per_page": round(seconds * 1e6, 1)})
+    baseline = results[0]["us_per_page"]
+    for result in results:
+        result["speedup"] = round(baseline / result["us_per_page"], 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100, int(sys.argv[2]) if len(sys.argv) > 2 else 50)
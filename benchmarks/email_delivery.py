@@ -0,0 +1,74 @@
+"""Email delivery throughput against a local aiosmtpd server: one FastMail connection per message
+against the pooled EmailWorker.
+
+Usage: python -m benchmarks.email_delivery [messages]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+SMTP_PORT = 8025
+for name, value in {"DATABASE_URL_ASYNC": "sqlite+aiosqlite:///:memory:", "SECRET_KEY": "benchmark",
+                    "ALGORITHM": "HS256", "MAIL_USERNAME": "benchmark", "MAIL_PASSWORD": "benchmark",
+                    "MAIL_FROM": "noreply@example.com", "MAIL_PORT": str(SMTP_PORT), "MAIL_SERVER": "127.0.0.1",
+                    "MAIL_FROM_NAME": "Benchmark", "MAIL_STARTTLS": "False", "MAIL_SSL_TLS": "False",
+                    "USE_CREDENTIALS": "False", "VALIDATE_CERTS": "False"}.items():
+    os.environ.setdefault(name, value)
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import FastMail, MessageSchema, MessageType
+
+from My_project.services.email import conf, email_worker, send_email
+
+
+class CountingHandler:
+    def __init__(self):
+        self.messages = 0
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return "250 OK"
+
+
+async def fastmail_per_message(count: int):
+    for i in range(count):
+        message = MessageSchema(subject="Confirm your email", recipients=[f"user{i}@example.com"],
+                                template_body={"host": "http://localhost/", "username": f"user{i}", "token": "t"},
+                                subtype=MessageType.html)
+        fm = FastMail(conf)
+        await fm.send_message(message, template_name="email_template.html")
+
+
+async def pooled_worker(count: int):
+    await email_worker.start()
+    await asyncio.gather(*(send_email(f"user{i}@example.com", f"user{i}", "http://localhost/") for i in range(count)))
+    await email_worker.stop(timeout=60)
+
+
+async def main(count: int):
+    results = []
+    for name, scenario in (("fastmail_per_message", fastmail_per_message), ("pooled_worker", pooled_worker)):
+        handler = CountingHandler()
+        controller = Controller(handler, hostname="127.0.0.1", port=SMTP_PORT)
+        controller.start()
+        try:
+            started = time.perf_counter()
+            await scenario(count)
+            elapsed = time.perf_counter() - started
+        finally:
+            controller.stop()
+        results.append({"scenario": name, "messages": handler.messages, "smtp_sessions": handler.connections,
+                        "seconds": round(elapsed, 3), "messages_per_second": round(handler.messages / elapsed, 1)})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,66 @@
+"""Event-loop lag during a burst of concurrent logins, with bcrypt run inline and in the worker pool.
+
+Usage: python -m benchmarks.hash_event_loop_lag [concurrency]
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL_ASYNC", "sqlite+aiosqlite:///:memory:")
+
+from My_project.services.auth import Hash
+
+TICK = 0.005
+
+
+async def measure_lag(stop: asyncio.Event, lags: list):
+    """Sleep for TICK repeatedly and record how late every wake-up is"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - started - TICK) * 1000)
+
+
+async def run_scenario(name: str, login, concurrency: int) -> dict:
+    stop = asyncio.Event()
+    lags = []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    lags.sort()
+    return {
+        "scenario": name,
+        "logins": concurrency,
+        "wall_seconds": round(elapsed, 3),
+        "lag_ms_p50": round(statistics.median(lags), 2),
+        "lag_ms_p99": round(lags[int(len(lags) * 0.99) - 1 if len(lags) > 1 else 0], 2),
+        "lag_ms_max": round(lags[-1], 2),
+    }
+
+
+async def main(concurrency: int):
+    hash = Hash()
+    hashed = hash.get_password_hash("benchmark-password")
+
+    async def login_inline():
+        hash.verify_password("benchmark-password", hashed)
+
+    async def login_pool():
+        await hash.verify_password_async("benchmark-password", hashed)
+
+    results = [
+        await run_scenario("inline", login_inline, concurrency),
+        await run_scenario("worker_pool", login_pool, concurrency),
+    ]
+    print(json.dumps({"results": results, "pool_stats": Hash.stats}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
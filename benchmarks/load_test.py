@@ -0,0 +1,213 @@
+"""In-process load test of the whole application: latency percentiles and throughput per route.
+
+Boots main.app behind httpx.ASGITransport on a temporary aiosqlite database and fakeredis
+(pip install "fakeredis[lua]"). The lifespan is not run; the Redis-backed components are
+initialised by hand and the rate limiter is switched off with RATE_LIMIT_ENABLED=false.
+Synthetic users and contacts are seeded, every user logs in, then concurrent workers
+drive a weighted mix of list/get/create/update/delete requests.
+
+Usage: python -m benchmarks.load_test [--users N] [--contacts N] [--concurrency N]
+                                      [--requests N] [--output report.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+BENCH_DIR = tempfile.mkdtemp(prefix="load-test-")
+for name, value in {"DATABASE_URL_ASYNC": f"sqlite+aiosqlite:///{BENCH_DIR}/load_test.db",
+                    "RATE_LIMIT_ENABLED": "false", "SECRET_KEY": "benchmark", "ALGORITHM": "HS256",
+                    "MAIL_USERNAME": "benchmark", "MAIL_PASSWORD": "benchmark", "MAIL_FROM": "noreply@example.com",
+                    "MAIL_PORT": "1025", "MAIL_SERVER": "127.0.0.1", "MAIL_FROM_NAME": "Benchmark",
+                    "MAIL_STARTTLS": "False", "MAIL_SSL_TLS": "False", "USE_CREDENTIALS": "False",
+                    "VALIDATE_CERTS": "False", "AVATAR_STORAGE": "local",
+                    "AVATAR_LOCAL_ROOT": f"{BENCH_DIR}/avatars"}.items():
+    os.environ.setdefault(name, value)
+
+import fakeredis
+import httpx
+from sqlalchemy import insert
+
+from main import app
+from My_project.database.database import AsyncSessionLocal, async_engine
+from My_project.database.models import Base, User
+from My_project.repository import contact as repository_contacts
+from My_project.schemas import ContactCreate
+from My_project.services.auth import Hash
+from My_project.services.avatar import avatar_pipeline
+from My_project.services.rate_limit import RateLimiter
+from My_project.services.response_cache import response_cache
+from My_project.services.user_cache import user_cache
+
+PASSWORD = "benchmark-password"
+SCENARIOS = {"list": 4, "get": 3, "create": 1, "update": 1, "delete": 1}
+
+
+def contact_body(number: int) -> dict:
+    return {
+        "first_name": f"First{number}",
+        "last_name": f"Last{number}",
+        "date_of_birthday": f"19{50 + number % 50}-{number % 12 + 1:02d}-{number % 28 + 1:02d}",
+        "additional_data": f"Synthetic contact {number}",
+        "phone_numbers": [{"phone_number": f"+38050{number:07d}"}],
+        "emails": [{"email": f"contact{number}@example.com"}],
+    }
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    index = max(0, min(len(samples) - 1, round(fraction * len(samples) + 0.5) - 1))
+    return samples[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, route: str, status_code: int, seconds: float) -> None:
+        self.latencies[route].append(seconds)
+        self.statuses[route][status_code] += 1
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            routes[route] = {
+                "requests": len(samples),
+                "statuses": dict(self.statuses[route]),
+                "throughput_rps": round(len(samples) / elapsed, 1),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {"elapsed_seconds": round(elapsed, 3), "requests": total,
+                "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0, "routes": routes}
+
+
+async def timed(client: httpx.AsyncClient, recorder: Recorder, route: str, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    recorder.record(route, response.status_code, time.perf_counter() - started)
+    return response
+
+
+async def seed(users: int, contacts: int) -> dict:
+    """Create the schema, users and contacts; return contact IDs by user email"""
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    password_hash = Hash().get_password_hash(PASSWORD)
+    emails = [f"user{number}@example.com" for number in range(users)]
+    contact_ids = {}
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(insert(User).returning(User.id, sort_by_parameter_order=True), [
+            {"username": f"user{number}", "email": email, "password": password_hash, "confirmed": True}
+            for number, email in enumerate(emails)
+        ])
+        await db.commit()
+        for email, user_id in zip(emails, result.scalars().all()):
+            bodies = [ContactCreate(**contact_body(number)) for number in range(contacts)]
+            contact_ids[email] = list(await repository_contacts.create_contacts(bodies, User(id=user_id), db))
+    return contact_ids
+
+
+async def login_phase(client: httpx.AsyncClient, emails: list, concurrency: int, recorder: Recorder) -> dict:
+    """Log every user in; return access tokens by email"""
+    semaphore = asyncio.Semaphore(concurrency)
+    tokens = {}
+
+    async def login(email: str):
+        async with semaphore:
+            response = await timed(client, recorder, "POST /api/authentication/login", "POST",
+                                   "/api/authentication/login", data={"username": email, "password": PASSWORD})
+            tokens[email] = response.json()["access_token"]
+
+    await asyncio.gather(*(login(email) for email in emails))
+    return tokens
+
+
+async def worker(client: httpx.AsyncClient, requests: int, tokens: dict, contact_ids: dict,
+                 recorder: Recorder, rng: random.Random) -> None:
+    names, weights = list(SCENARIOS), list(SCENARIOS.values())
+    for _ in range(requests):
+        email = rng.choice(list(tokens))
+        headers = {"Authorization": f"Bearer {tokens[email]}"}
+        ids = contact_ids[email]
+        scenario = rng.choices(names, weights)[0]
+        if scenario != "create" and scenario != "list" and not ids:
+            scenario = "create"
+
+        if scenario == "list":
+            await timed(client, recorder, "GET /api/contact/", "GET", "/api/contact/",
+                        params={"skip": rng.randrange(0, max(1, len(ids))), "limit": 20}, headers=headers)
+        elif scenario == "get":
+            await timed(client, recorder, "GET /api/contact/{contact_id}", "GET",
+                        f"/api/contact/{rng.choice(ids)}", headers=headers)
+        elif scenario == "create":
+            response = await timed(client, recorder, "POST /api/contact/", "POST", "/api/contact/",
+                                   json=contact_body(rng.randrange(10 ** 6)), headers=headers)
+            if response.status_code < 300:
+                ids.append(response.json()["id"])
+        elif scenario == "update":
+            await timed(client, recorder, "PUT /api/contact/{contact_id}", "PUT",
+                        f"/api/contact/{rng.choice(ids)}",
+                        json=contact_body(rng.randrange(10 ** 6)), headers=headers)
+        else:
+            contact_id = ids.pop(rng.randrange(len(ids)))
+            await timed(client, recorder, "DELETE /api/contact/{contact_id}", "DELETE",
+                        f"/api/contact/{contact_id}", headers=headers)
+
+
+async def main(args: argparse.Namespace):
+    redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    await RateLimiter.init(redis_client)
+    await user_cache.init(redis_client)
+    await response_cache.init(redis_client)
+    await avatar_pipeline.init(redis_client)
+
+    contact_ids = await seed(args.users, args.contacts)
+    rng = random.Random(args.seed)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        login_recorder = Recorder()
+        started = time.perf_counter()
+        tokens = await login_phase(client, list(contact_ids), args.concurrency, login_recorder)
+        login_elapsed = time.perf_counter() - started
+
+        mixed_recorder = Recorder()
+        per_worker, remainder = divmod(args.requests, args.concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, per_worker + (index < remainder), tokens, contact_ids,
+                                      mixed_recorder, random.Random(rng.random()))
+                               for index in range(args.concurrency)))
+        mixed_elapsed = time.perf_counter() - started
+
+    await async_engine.dispose()
+    report = {
+        "config": vars(args),
+        "login": login_recorder.report(login_elapsed),
+        "mixed": mixed_recorder.report(mixed_elapsed),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--contacts", type=int, default=200, help="contacts seeded per user")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="requests in the mixed phase")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    asyncio.run(main(parser.parse_args()))
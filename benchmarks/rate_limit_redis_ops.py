@@ -0,0 +1,67 @@
+"""Redis commands per request: fastapi_limiter against the hybrid token-bucket limiter.
+
+Needs fakeredis with Lua support (pip install "fakeredis[lua]"); no Redis server is used.
+Usage: python -m benchmarks.rate_limit_redis_ops [requests] [limit]
+"""
+import asyncio
+import json
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL_ASYNC", "sqlite+aiosqlite:///:memory:")
+
+import fakeredis
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi_limiter import FastAPILimiter
+from fastapi_limiter.depends import RateLimiter as LegacyRateLimiter
+
+from My_project.services.rate_limit import RateLimiter
+
+
+class CountingRedis(fakeredis.FakeAsyncRedis):
+    commands = 0
+
+    async def execute_command(self, *args, **kwargs):
+        CountingRedis.commands += 1
+        return await super().execute_command(*args, **kwargs)
+
+
+async def drive(client: httpx.AsyncClient, path: str, requests: int) -> dict:
+    CountingRedis.commands = 0
+    statuses = {}
+    for _ in range(requests):
+        response = await client.get(path)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return {
+        "limiter": path.strip("/"),
+        "requests": requests,
+        "statuses": statuses,
+        "redis_commands": CountingRedis.commands,
+        "redis_commands_per_request": round(CountingRedis.commands / requests, 3),
+    }
+
+
+async def main(requests: int, limit: int):
+    redis_client = CountingRedis(decode_responses=True)
+    await FastAPILimiter.init(redis_client)
+    await RateLimiter.init(redis_client)
+
+    app = FastAPI()
+
+    @app.get("/legacy", dependencies=[Depends(LegacyRateLimiter(times=limit, seconds=60))])
+    async def legacy():
+        return {}
+
+    @app.get("/hybrid", dependencies=[Depends(RateLimiter(times=limit, seconds=60))])
+    async def hybrid():
+        return {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        results = [await drive(client, "/legacy", requests), await drive(client, "/hybrid", requests)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 10000))
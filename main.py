@@ -3,9 +3,21 @@ from os import environ
 import redis.asyncio as redis
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
-from My_project.routers import contact, auth, users
+from fastapi.responses import PlainTextResponse
+from fastapi.staticfiles import StaticFiles
+from My_project.routers import contact, auth, users, internal
+from My_project.database.database import async_engine, replica_engine, pool_stats
+from My_project.database.routing import stickiness
+from My_project.services.auth import Hash, token_cache
+from My_project.services.metrics import metrics, MetricsMiddleware
+from My_project.services.diagnostics import diagnostics
+from My_project.services.internal_auth import require_internal_token
+from My_project.services.refresh_tokens import refresh_tokens
+from My_project.services.rate_limit import RateLimiter
+from My_project.services.user_cache import user_cache
+from My_project.services.response_cache import response_cache
+from My_project.services.email import email_worker
+from My_project.services.avatar import avatar_pipeline, AVATAR_STORAGE, AVATAR_LOCAL_ROOT, AVATAR_LOCAL_URL
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
@@ -25,8 +37,15 @@ async def startup(app: FastAPI):
             encoding="utf-8",
             decode_responses=True
         )
+        metrics.instrument_redis(redis_client)
         await redis_client.ping()
-        await FastAPILimiter.init(redis_client)
+        await RateLimiter.init(redis_client)
+        await user_cache.init(redis_client)
+        await response_cache.init(redis_client)
+        await avatar_pipeline.init(redis_client)
+        await stickiness.init(redis_client)
+        await refresh_tokens.init(redis_client)
+        await email_worker.start()
         yield
     except redis.ConnectionError:
         print("Could not connect to Redis. Please check your Redis server.")
@@ -34,6 +53,7 @@ async def startup(app: FastAPI):
             await redis_client.close()
         raise
     finally:
+        await email_worker.stop()
         if redis_client:
             await redis_client.close()
 
@@ -49,15 +69,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(MetricsMiddleware)
+
+metrics.instrument_engine(async_engine)
+diagnostics.instrument_engine(async_engine)
+metrics.add_collector("db_pool", "Database connection pool statistics", pool_stats)
+if replica_engine is not None:
+    metrics.instrument_engine(replica_engine)
+    diagnostics.instrument_engine(replica_engine)
+    metrics.add_collector("db_replica_pool", "Replica connection pool statistics", lambda: pool_stats(replica_engine))
+metrics.add_collector("password_hash", "Password hashing executor statistics", lambda: Hash.stats)
+metrics.add_collector("token_cache", "Decoded JWT cache statistics", token_cache.stats)
 
 app.include_router(contact.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
+app.include_router(internal.router, prefix="/api")
+
+if AVATAR_STORAGE == "local":
+    app.mount(AVATAR_LOCAL_URL, StaticFiles(directory=AVATAR_LOCAL_ROOT, check_dir=False), name="avatars")
 
 @app.get("/", dependencies=[Depends(RateLimiter(times=10, seconds=60))])
 async def read_root():
     return {"message": "Hello World"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False,
+         dependencies=[Depends(require_internal_token)])
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run(app, host="localhost", port=8000)